@@ -2,15 +2,20 @@ import datetime
 
 from django.contrib.auth.admin import UserAdmin
 from datetime import timedelta
-from api.models.enums import BookingStatus
-from django.db.models import Q
-from api.models.models import UserExtra, Barber, BarberQualification, BarberSchedule, TimeOffRequest, Booking, \
-    SelectedService, Service
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q, F, FilteredRelation, Sum, Value, Count
+from django.db.models.functions import Coalesce
+from api.models.models import UserExtra, Barber, BarberBreak, BarberQualification, BarberSchedule, TimeOffRequest, \
+    Booking, SelectedService, Service, DailyBarberEarnings, RecurringTimeOff
+from api.cache import get_versions, make_key
 from api.formsets import SelectedServicesInlineFormset
+from api.schedules import weekday_order
+from django.http import HttpResponse
+from django.urls import path
 from django.utils import timezone
 from django.contrib import admin
 from django.contrib.auth.models import User as UserDefaultModel
-import pandas as pd
 
 
 class UserExtraInline(admin.StackedInline):
@@ -31,11 +36,29 @@ class BarberScheduleInline(admin.TabularInline):
     model = BarberSchedule
     can_delete = True
     extra = 1
-    max_num = 7
 
     verbose_name = "Barber's Schedule"
     verbose_name_plural = "Barber's Schedule"
 
+    def get_queryset(self, request):
+        # List the days from Monday to Sunday rather than in the order they were added,
+        # with the windows of a split shift in order
+        return super().get_queryset(request).order_by(weekday_order(), 'start_time')
+
+
+class BarberBreakInline(admin.TabularInline):
+    model = BarberBreak
+    can_delete = True
+    extra = 0
+
+    fields = ['day_of_week', 'start_time', 'end_time', 'reason']
+
+    verbose_name = "Barber's Break"
+    verbose_name_plural = "Barber's Breaks"
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).order_by(weekday_order(), 'start_time')
+
 
 class BarberQualificationInline(admin.TabularInline):
     model = BarberQualification
@@ -61,6 +84,17 @@ class TimeOffRequestInline(admin.TabularInline):
         return False
 
 
+class RecurringTimeOffInline(admin.TabularInline):
+    model = RecurringTimeOff
+    can_delete = True
+    extra = 0
+
+    fields = ['frequency', 'start_date', 'until', 'start_time', 'end_time', 'exceptions', 'isApproved']
+
+    verbose_name = "Recurring Time Off"
+    verbose_name_plural = "Recurring Time Off"
+
+
 class BookingInline(admin.TabularInline):
     model = Booking
     can_delete = True
@@ -164,18 +198,35 @@ class TimeOffRequestAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+class RecurringTimeOffAdmin(TimeOffRequestAdmin):
+    list_display = ['barber', 'frequency', 'start_date', 'until', 'start_time', 'end_time', 'isApproved']
+
+    fields = ['barber', 'frequency', 'start_date', 'until', 'start_time', 'end_time', 'exceptions', 'reason',
+              'isApproved']
+
+    def get_fields(self, request, obj=None):
+        """
+        Barbers create recurring time off for themselves only, see ``save_model``.
+        """
+        fields = super().get_fields(request, obj)
+        if request.user.is_staff and hasattr(request.user, 'barber'):
+            return [field for field in fields if field != 'barber']
+        return fields
+
+
 class BookingAdmin(admin.ModelAdmin):
     inlines = [SelectedServicesInline]
     list_display = ['barber', 'booking_date', 'start_time', 'status']
     list_editable = ['status']
 
 
-import plotly.graph_objs as go
-from plotly.offline import plot
+# Cached chart figures are versioned by the rollup, the timeout only bounds memory use
+REPORT_CACHE_TIMEOUT = 60 * 60
 
 
 class BarberAdmin(admin.ModelAdmin):
-    inlines = [BookingInline, TimeOffRequestInline, BarberQualificationInline, BarberScheduleInline]
+    inlines = [BookingInline, TimeOffRequestInline, RecurringTimeOffInline, BarberQualificationInline,
+               BarberScheduleInline, BarberBreakInline]
     list_display = ('user', 'get_appointments_count_today', 'get_expected_earnings_today')
     search_fields = ('user__username', 'socialInsuranceNumber')
     list_filter = ('user',)
@@ -185,76 +236,76 @@ class BarberAdmin(admin.ModelAdmin):
 
     change_list_template = "admin/barber_change_list.html"
 
-    def get_appointments_today(self, obj):
+    def get_queryset(self, request):
         """
-        Returns the number of appointments the barber has today.
+        Annotate today's appointment count and expected earnings from the rollup, so the
+        changelist columns need no query per row. The join is limited to today's row of
+        each barber, so its cost does not grow with the history of the rollup.
         """
         today = timezone.now().date()
-        appointments = Booking.objects.filter(
-            Q(status=BookingStatus.CONFIRMED) | Q(status=BookingStatus.COMPLETED),
-            barber=obj,
-            booking_date=today)
-        return appointments
+        return super().get_queryset(request).select_related('user').annotate(
+            earnings_today=FilteredRelation('daily_earnings', condition=Q(daily_earnings__date=today)),
+            appointments_today=Coalesce(F('earnings_today__confirmed') + F('earnings_today__completed'), 0),
+            expected_earnings_today=Coalesce(F('earnings_today__billable_gross'), Value(0.0)),
+        )
 
     def get_appointments_count_today(self, obj):
-        return self.get_appointments_today(obj).count()
+        """Returns the number of confirmed and completed appointments the barber has today."""
+        return obj.appointments_today
 
     def get_expected_earnings_today(self, obj):
         """Returns Expected Earnings Today, for confirmed and completed bookings"""
-        appointments = self.get_appointments_today(obj)
-        earnings = 0
-        for appointment in appointments:
-            selected_services = appointment.selectedservice_set.all()
-            if selected_services.exists():
-                for service in selected_services:
-                    earnings += service.service.price
-        return f'${earnings:.2f}'
+        return f'${obj.expected_earnings_today:.2f}'
 
     def get_report_data(self, start_date=None, end_date=None):
         """
-        Calculate earnings based on the date range.
+        Earnings totals of the date range, read from the DailyBarberEarnings rollup.
         Default date range is today.
         """
-        df = pd.DataFrame(Barber.prepare_df_data(start_date, end_date))
-        if len(df) == 0:
-            return None
-
         today = timezone.now().date()
         if not start_date:
             start_date = today
         if not end_date:
             end_date = today
-        # earnings_total = self.get_total_earnings(start_date, end_date)
-        # print(df)
-
-        df['barberCut'] = df['servicePrice'] * df['barberMargin'] / 100
-        df['shopCut'] = df['servicePrice'] * (100 - df['barberMargin']) / 100
-
-        earnings_total = df['servicePrice'].sum()
-        earnings_after_margin = df['shopCut'].sum().round(2)
-
-        traces = []
-        total_earnings = df.groupby('bookingDate')['servicePrice'].sum()
-        trace = go.Scatter(x=total_earnings.index, y=total_earnings.values, mode='lines', name='Total')
-        traces.append(trace)
-        for barber in df['barberName'].unique():
-            barberDf = df[df['barberName'] == barber]
-            barber_earnings = barberDf.groupby('bookingDate')['servicePrice'].sum()
-            trace = go.Scatter(x=barber_earnings.index, y=barber_earnings.values, mode='lines', name=barber)
-            traces.append(trace)
-        layout = go.Layout(
-            title='Projected Earnings Per Day',
-            xaxis=dict(title='Date'),
-            yaxis=dict(title='Earnings'),
+
+        totals = DailyBarberEarnings.objects.filter(date__range=(start_date, end_date)).aggregate(
+            rows=Count('id'), gross=Sum('gross'), shop_cut=Sum('shop_cut'),
         )
-        fig = go.Figure(data=traces, layout=layout)
+        if not totals['rows']:
+            return None
         return {
-            'earnings_total': earnings_total,
-            'earnings_after_margin': earnings_after_margin,
-            'plot_div': fig.to_html()
+            'earnings_total': round(totals['gross'], 2),
+            'earnings_after_margin': round(totals['shop_cut'], 2),
         }
 
-    def changelist_view(self, request, extra_context=None):
+    def get_report_figure(self, start_date, end_date):
+        """
+        Plotly figure of the earnings per day as a JSON string, ``None`` without bookings.
+
+        pandas and plotly are only imported here, so that processes serving the API never load them.
+        """
+        from api import reports
+        return reports.get_report_figure(start_date, end_date)
+
+    def get_cached_report_figure(self, start_date, end_date):
+        """
+        ``get_report_figure`` cached per date range until the rollup changes.
+
+        Returns:
+            str: Figure JSON, ``null`` if there are no bookings in the date range.
+        """
+        namespace = DailyBarberEarnings.REPORT_CACHE
+        version = get_versions([namespace])[namespace]
+        key = make_key(namespace, version, start_date.isoformat(), end_date.isoformat())
+        figure = cache.get(key)
+        if figure is None:
+            figure = self.get_report_figure(start_date, end_date) or 'null'
+            cache.set(key, figure, REPORT_CACHE_TIMEOUT)
+        return figure
+
+    @staticmethod
+    def get_report_range(request):
+        """Parse the ``start_date`` and ``end_date`` query parameters, defaulting to the coming week."""
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
 
@@ -270,8 +321,29 @@ class BarberAdmin(admin.ModelAdmin):
                 end_date = timezone.datetime.strptime(end_date, "%Y-%m-%d").date()
         except ValueError:
             start_date = end_date = timezone.now().date()
+        return start_date, end_date
+
+    def get_urls(self):
+        urls = [
+            path(
+                'report-data/',
+                self.admin_site.admin_view(self.report_data_view),
+                name='api_barber_report_data',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def report_data_view(self, request):
+        """Figure JSON of the earnings chart, fetched by the changelist once the page has loaded."""
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        start_date, end_date = self.get_report_range(request)
+        return HttpResponse(self.get_cached_report_figure(start_date, end_date), content_type='application/json')
+
+    def changelist_view(self, request, extra_context=None):
+        start_date, end_date = self.get_report_range(request)
 
-        # Get the report data
+        # Get the report totals, the chart is fetched separately from report_data_view
         report_data = self.get_report_data(start_date, end_date)
 
         # Pass the report data to the template
@@ -292,7 +364,9 @@ class BarberAdmin(admin.ModelAdmin):
         return False
 
     get_appointments_count_today.short_description = "Appointments Today"
+    get_appointments_count_today.admin_order_field = 'appointments_today'
     get_expected_earnings_today.short_description = "Expected Earnings Today"
+    get_expected_earnings_today.admin_order_field = 'expected_earnings_today'
 
 
 admin.site.register(Barber, BarberAdmin)
@@ -301,6 +375,7 @@ admin.site.unregister(UserDefaultModel)
 admin.site.register(UserDefaultModel, CustomUserAdmin)
 admin.site.register(Service, ServiceAdmin)
 admin.site.register(TimeOffRequest, TimeOffRequestAdmin)
+admin.site.register(RecurringTimeOff, RecurringTimeOffAdmin)
 admin.site.register(Booking, BookingAdmin)
 
 admin.site.site_header = "Number One Barbershop"
@@ -0,0 +1,204 @@
+"""
+Async variants of the read-only booking endpoints, served under ``/api/async/``.
+
+They return the same payloads as their counterparts in ``api.views`` but use the async
+ORM, so that under ASGI a worker keeps serving other requests while it waits for the
+database. Independent queries of one request run concurrently.
+"""
+import asyncio
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Sum
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
+
+from api import catalogue
+from api.availability import aget_day_slots, cutoff, from_minutes
+from api.models.models import Barber, Booking, Service, TimeOffRequest
+from api.schedules import RECURRING_TIME_OFF_HORIZON, last_time_off_date
+from api.serializers import BarberSerializer, ServiceSerializer
+from api.views import QUALIFIED_BARBERS_TABLES, SERVICES_TABLES, build_availability_calendar, get_service_ids
+
+
+def error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def acondition(etag_func, last_modified_func):
+    """
+    ``django.views.decorators.http.condition`` for async views with async ETag and
+    Last-Modified functions, which Django's decorator would call on the event loop.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag, last_modified = await asyncio.gather(
+                etag_func(request, *args, **kwargs), last_modified_func(request, *args, **kwargs))
+            etag = quote_etag(etag) if etag is not None else None
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+async def get_services_etag(request):
+    return await catalogue.aget_etag(SERVICES_TABLES)
+
+
+async def get_services_last_modified(request):
+    return await catalogue.aget_last_modified(SERVICES_TABLES)
+
+
+async def get_qualified_barbers_etag(request):
+    service_id = request.GET.get('service_id')
+    if not service_id:
+        return None
+    # Profile image URLs are absolute, so the payload depends on the host too
+    return await catalogue.aget_etag(QUALIFIED_BARBERS_TABLES, service_id, request.build_absolute_uri('/'))
+
+
+async def get_qualified_barbers_last_modified(request):
+    if not request.GET.get('service_id'):
+        return None
+    return await catalogue.aget_last_modified(QUALIFIED_BARBERS_TABLES)
+
+
+@require_GET
+@cache_control(public=True, max_age=catalogue.CATALOGUE_MAX_AGE)
+@acondition(etag_func=get_services_etag, last_modified_func=get_services_last_modified)
+async def get_services(request):
+    """Returns list of available services."""
+    async def build():
+        return ServiceSerializer([service async for service in Service.objects.all()], many=True).data
+
+    return JsonResponse(await catalogue.aget_payload(SERVICES_TABLES, [], build), safe=False)
+
+
+@require_GET
+@cache_control(public=True, max_age=catalogue.CATALOGUE_MAX_AGE)
+@acondition(etag_func=get_qualified_barbers_etag, last_modified_func=get_qualified_barbers_last_modified)
+async def get_qualified_barbers(request):
+    """Returns list of qualified barbers for the provided service id."""
+    service_id = request.GET.get('service_id')
+    if not service_id:
+        return error("Service ID is required.", 400)
+
+    async def build():
+        qualified_barbers = Barber.objects.filter(
+            barberqualification__service_id=service_id
+        ).select_related('user').distinct()
+        barbers = [barber async for barber in qualified_barbers]
+        return BarberSerializer(barbers, many=True, context={'request': request}).data
+
+    parts = [service_id, request.build_absolute_uri('/')]
+    return JsonResponse(await catalogue.aget_payload(QUALIFIED_BARBERS_TABLES, parts, build), safe=False)
+
+
+async def aget_services_duration(service_ids):
+    """
+    Async version of ``api.views.get_services_duration``.
+
+    Raises:
+        Service.DoesNotExist: If any of the services does not exist.
+    """
+    service_ids = {int(service_id) for service_id in service_ids}
+    services = await Service.objects.filter(id__in=service_ids).aaggregate(total=Sum('duration'), count=Count('id'))
+    if not service_ids or services['count'] != len(service_ids):
+        raise Service.DoesNotExist('Service not found.')
+    return services['total']
+
+
+@require_GET
+async def get_available_timeslots(request):
+    """
+    Retrieve available time slots for a specific barber on a specific date. Several
+    service_id values can be given to get slots for their combined duration.
+    """
+    try:
+        service_ids = get_service_ids(request)
+    except ValueError:
+        return error("service_id must be a list of integers.", 400)
+
+    try:
+        barber_id = request.GET.get('barber_id')
+        date = request.GET.get('date')
+
+        if not barber_id or not date or not service_ids:
+            return error("barber_id, date, service_id are required parameters", 400)
+
+        date = datetime.strptime(date, '%Y-%m-%d').date()
+        now = datetime.now()
+        if date < now.date():
+            return JsonResponse([], safe=False)
+
+        try:
+            duration = await aget_services_duration(service_ids)
+        except Service.DoesNotExist:
+            return JsonResponse([], safe=False)
+
+        working, slots = (await aget_day_slots([barber_id], date, date, duration))[(int(barber_id), date)]
+        not_before = cutoff(date, now)
+        slots = [from_minutes(slot) for slot in slots if not_before is None or slot > not_before]
+        return JsonResponse(slots, safe=False)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@require_GET
+async def get_blocked_dates(request):
+    """
+    Returns a list of dates that are fully booked or unavailable for a given barber.
+    When no service_id is provided, a date is blocked if even the shortest service does not fit.
+    """
+    barber_id = request.GET.get('barber_id')
+    try:
+        service_ids = get_service_ids(request)
+    except ValueError:
+        return error("service_id must be a list of integers.", 400)
+
+    if not barber_id:
+        return error("Barber ID is required.", 400)
+
+    today = datetime.now().date()
+
+    async def duration():
+        if service_ids:
+            return await aget_services_duration(service_ids)
+        service = await Service.objects.order_by('duration').afirst()
+        return service.duration if service else None
+
+    # The duration and the last busy dates do not depend on each other
+    try:
+        duration, last_booking, last_time_off = await asyncio.gather(
+            duration(),
+            Booking.objects.filter(barber_id=barber_id, booking_date__gte=today).aaggregate(last=Max('booking_date')),
+            TimeOffRequest.objects.filter(barber_id=barber_id, date__gte=today, isApproved=True).aaggregate(
+                last=Max('date')),
+        )
+    except Service.DoesNotExist:
+        return error("Service not found.", 404)
+
+    # Only dates up to the last booking or time off can be fully booked
+    last_recurring = await sync_to_async(last_time_off_date)(barber_id, today, today + RECURRING_TIME_OFF_HORIZON)
+    busy_until = max(filter(None, [last_booking['last'], last_time_off['last'], last_recurring]), default=None)
+    if duration is None or busy_until is None:
+        return JsonResponse([], safe=False)
+
+    days = await aget_day_slots([barber_id], today, busy_until, duration)
+    calendar = build_availability_calendar(barber_id, days, today, busy_until)
+    blocked_dates = [day['date'] for day in calendar if day['working'] and day['blocked']]
+    return JsonResponse([date.strftime('%Y-%m-%d') for date in blocked_dates], safe=False)
@@ -0,0 +1,335 @@
+"""
+Availability engine used by the booking endpoints.
+
+All computations work on integer minutes since midnight instead of ``datetime``
+objects. Busy intervals are sorted and merged once per day, after which free slots
+are produced by walking the gaps between merged intervals, so the cost is
+proportional to the number of intervals plus the number of returned slots rather
+than slots x bookings.
+
+Computed slots are cached per barber, day and service duration. Entries are
+invalidated through versioned namespaces bumped by the model signals in
+``api.signals``.
+"""
+import asyncio
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from api.cache import bump_version, get_versions, make_key, record_stats
+from api.models.models import Booking, TimeOffRequest
+from api.schedules import DAYS_OFF, get_time_off_rules, get_weekly_schedules
+
+SLOT_MINUTES = 15
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value: time) -> int:
+    """Convert a ``datetime.time`` to minutes since midnight."""
+    return value.hour * 60 + value.minute
+
+
+def from_minutes(value: int) -> time:
+    """Convert minutes since midnight back to a ``datetime.time``."""
+    return time(value // 60, value % 60)
+
+
+def date_range(start_date, end_date):
+    """Yield every date from ``start_date`` to ``end_date`` inclusive."""
+    for offset in range((end_date - start_date).days + 1):
+        yield start_date + timedelta(days=offset)
+
+
+def cutoff(date, now):
+    """
+    Returns the ``not_before`` minute for slots on ``date`` given the current datetime:
+    ``None`` for future dates, the current minute for today and the end of the day
+    for past dates, so that no slot is offered in the past.
+    """
+    if date > now.date():
+        return None
+    if date == now.date():
+        return to_minutes(now.time())
+    return MINUTES_PER_DAY
+
+
+def merge_intervals(intervals):
+    """
+    Sort and merge overlapping or touching ``(start, end)`` intervals.
+
+    Args:
+        intervals (iterable): Pairs of minutes, ``start`` inclusive and ``end`` exclusive.
+
+    Returns:
+        list: Disjoint intervals sorted by start.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class DayAvailability:
+    """
+    Busy intervals of a single barber on a single day, ready for slot evaluation.
+
+    A slot starting at ``s`` is available for a service of ``duration`` minutes when it
+    lies inside the working window, ``s + duration`` does not exceed the end of the
+    window and ``[s, s + duration)`` overlaps no busy interval, so a slot may end exactly
+    where a booking starts.
+    """
+
+    def __init__(self, open_start: int, open_end: int, busy=()):
+        self.open_start = open_start
+        self.open_end = open_end
+        self.busy = merge_intervals(busy)
+        self._starts = [start for start, _ in self.busy]
+
+    @classmethod
+    def from_windows(cls, windows, busy=()):
+        """
+        Build the availability of a day with several working windows, such as a split shift.
+
+        The gaps between the windows become busy intervals, so they are merged with the
+        bookings, breaks and time-off once and the slots are evaluated in a single pass.
+
+        Args:
+            windows (iterable): Working windows as ``(start, end)`` minutes, in any order.
+            busy (iterable): Busy intervals of the day.
+        """
+        windows = merge_intervals(windows)
+        if not windows:
+            return cls(0, 0)
+        gaps = [(end, start) for (_, end), (start, _) in zip(windows, windows[1:])]
+        return cls(windows[0][0], windows[-1][1], [*gaps, *busy])
+
+    def blocked(self, duration: int):
+        """Returns the slot starts blocked by busy intervals for the given duration, merged."""
+        return merge_intervals((start - duration + 1, end) for start, end in self.busy)
+
+    def iter_slots(self, duration: int, not_before: int = None, step: int = SLOT_MINUTES):
+        """
+        Yield available slot starts (in minutes) for a service of ``duration`` minutes.
+
+        Args:
+            duration (int): Length of the requested service in minutes.
+            not_before (int): Slots at or before this minute are skipped (used for today).
+            step (int): Slot granularity in minutes.
+        """
+        last_start = self.open_end - duration
+        lower = self.open_start
+        if not_before is not None and not_before >= lower:
+            # First grid slot strictly after ``not_before``
+            lower = self.open_start + ((not_before - self.open_start) // step + 1) * step
+
+        cursor = lower
+        for start, end in self.blocked(duration):
+            if end <= cursor:
+                continue
+            gap_end = min(start, last_start + 1)
+            yield from range(cursor, gap_end, step)
+            cursor = self.open_start + -(-(end - self.open_start) // step) * step
+            if cursor > last_start:
+                return
+        yield from range(cursor, last_start + 1, step)
+
+    def is_slot(self, start: int, duration: int, not_before: int = None, step: int = SLOT_MINUTES):
+        """Returns True if ``start`` is one of the slots ``iter_slots`` would yield."""
+        if (start - self.open_start) % step:
+            return False
+        if not_before is not None and start <= not_before:
+            return False
+        return self.is_free(start, duration)
+
+    def is_free(self, start: int, duration: int):
+        """Returns True if ``[start, start + duration)`` fits the window and overlaps no busy interval."""
+        if start < self.open_start or start + duration > self.open_end:
+            return False
+        index = bisect_right(self._starts, start + duration - 1) - 1
+        return index < 0 or self.busy[index][1] <= start
+
+
+def _day_querysets(barber_ids, start_date, end_date):
+    """Querysets of the bookings and approved time-off ``load_days`` builds the days from."""
+    bookings = Booking.objects.filter(
+        barber_id__in=barber_ids, booking_date__range=(start_date, end_date)
+    ).values_list('barber_id', 'booking_date', 'start_time', 'duration_minutes')
+    time_offs = TimeOffRequest.objects.filter(
+        barber_id__in=barber_ids, date__range=(start_date, end_date), isApproved=True
+    ).values_list('barber_id', 'date', 'start_time', 'end_time')
+    return bookings, time_offs
+
+
+def _build_days(barber_ids, start_date, end_date, schedules, time_off_rules, booking_rows, time_off_rows):
+    busy = defaultdict(list)
+    for barber_id in barber_ids:
+        for rule in time_off_rules.get(barber_id, ()):
+            for date in rule.occurrences(start_date, end_date):
+                busy[(barber_id, date)].append(rule.interval)
+    for barber_id, booking_date, start_time, duration_minutes in booking_rows:
+        booking_start = to_minutes(start_time)
+        busy[(barber_id, booking_date)].append((booking_start, booking_start + duration_minutes))
+    for barber_id, date, start_time, end_time in time_off_rows:
+        busy[(barber_id, date)].append((to_minutes(start_time), to_minutes(end_time)))
+
+    weeks = [(barber_id, schedules.get(barber_id, DAYS_OFF)) for barber_id in barber_ids]
+    days = {}
+    for date in date_range(start_date, end_date):
+        weekday = date.weekday()
+        for barber_id, week in weeks:
+            working_day = week[weekday]
+            if working_day is not None:
+                days[(barber_id, date)] = DayAvailability.from_windows(
+                    working_day.windows, [*working_day.breaks, *busy.get((barber_id, date), ())])
+    return days
+
+
+def load_days(barber_ids, start_date, end_date):
+    """
+    Load bookings and approved time-off for several barbers over a date range in a fixed
+    number of queries and build their ``DayAvailability`` objects with the cached weekly
+    schedules and recurring time-off rules, expanded over the range only.
+
+    Args:
+        barber_ids (iterable): IDs of the barbers.
+        start_date (datetime.date): First date of the range.
+        end_date (datetime.date): Last date of the range, inclusive.
+
+    Returns:
+        dict: ``DayAvailability`` keyed by ``(barber_id, date)``. Days on which a barber
+        has no schedule are omitted.
+    """
+    barber_ids = [int(barber_id) for barber_id in barber_ids]
+    querysets = _day_querysets(barber_ids, start_date, end_date)
+    return _build_days(barber_ids, start_date, end_date, get_weekly_schedules(), get_time_off_rules(),
+                       *(list(queryset) for queryset in querysets))
+
+
+async def aload_days(barber_ids, start_date, end_date):
+    """Async version of ``load_days``, running its queries concurrently."""
+    barber_ids = [int(barber_id) for barber_id in barber_ids]
+    querysets = _day_querysets(barber_ids, start_date, end_date)
+    schedules, time_off_rules, *rows = await asyncio.gather(
+        sync_to_async(get_weekly_schedules)(), sync_to_async(get_time_off_rules)(),
+        *(_alist(queryset) for queryset in querysets))
+    return _build_days(barber_ids, start_date, end_date, schedules, time_off_rules, *rows)
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+AVAILABILITY_CACHE = 'availability'
+
+
+def barber_namespace(barber_id):
+    """Cache namespace covering every day of a barber, invalidated by schedule changes."""
+    return make_key(AVAILABILITY_CACHE, 'barber', barber_id)
+
+
+def day_namespace(barber_id, date):
+    """Cache namespace of a single barber and day, invalidated by booking and time-off changes."""
+    return make_key(AVAILABILITY_CACHE, 'day', barber_id, date.isoformat())
+
+
+def _get_cached_slots(barber_ids, start_date, end_date, duration):
+    """
+    Look up the cached slots of each barber and day.
+
+    Returns:
+        tuple: Cache key per ``(barber_id, date)``, the cached entries found and the
+        ``(barber_id, date)`` pairs that are missing.
+    """
+    dates = list(date_range(start_date, end_date))
+
+    namespaces = [AVAILABILITY_CACHE] + [barber_namespace(barber_id) for barber_id in barber_ids]
+    namespaces += [day_namespace(barber_id, date) for barber_id in barber_ids for date in dates]
+    versions = get_versions(namespaces)
+
+    keys = {}
+    for barber_id in barber_ids:
+        for date in dates:
+            keys[(barber_id, date)] = make_key(
+                AVAILABILITY_CACHE, versions[AVAILABILITY_CACHE], barber_id,
+                versions[barber_namespace(barber_id)], date.isoformat(),
+                versions[day_namespace(barber_id, date)], duration,
+            )
+    found = cache.get_many(keys.values())
+    result = {day_key: found[key] for day_key, key in keys.items() if key in found}
+    missing = [day_key for day_key in keys if day_key not in result]
+    return keys, result, missing
+
+
+def _missing_range(missing):
+    """Barbers and date range ``load_days`` has to cover to rebuild the missing days."""
+    return {barber_id for barber_id, _ in missing}, min(date for _, date in missing), max(date for _, date in missing)
+
+
+def _store_slots(keys, result, missing, days, duration):
+    """Compute the slots of the missing days into ``result`` and cache them."""
+    fresh = {}
+    for day_key in missing:
+        day = days.get(day_key)
+        entry = (False, []) if day is None else (True, list(day.iter_slots(duration)))
+        result[day_key] = entry
+        fresh[keys[day_key]] = entry
+    if fresh:
+        cache.set_many(fresh)
+    record_stats(AVAILABILITY_CACHE, hits=len(keys) - len(missing), misses=len(missing))
+
+
+def get_day_slots(barber_ids, start_date, end_date, duration):
+    """
+    Returns the free slot starts of each barber and day for a service duration, reading
+    from the availability cache and rebuilding only the missing days with ``load_days``.
+
+    Cached slots are not filtered by the current time; apply ``cutoff`` to the result.
+
+    Args:
+        barber_ids (iterable): IDs of the barbers.
+        start_date (datetime.date): First date of the range.
+        end_date (datetime.date): Last date of the range, inclusive.
+        duration (int): Length of the requested service in minutes.
+
+    Returns:
+        dict: ``(working, slots)`` keyed by ``(barber_id, date)``, where ``slots`` is a
+        list of minutes since midnight.
+    """
+    barber_ids = [int(barber_id) for barber_id in barber_ids]
+    keys, result, missing = _get_cached_slots(barber_ids, start_date, end_date, duration)
+    days = load_days(*_missing_range(missing)) if missing else {}
+    _store_slots(keys, result, missing, days, duration)
+    return result
+
+
+async def aget_day_slots(barber_ids, start_date, end_date, duration):
+    """Async version of ``get_day_slots``, rebuilding missing days with ``aload_days``."""
+    barber_ids = [int(barber_id) for barber_id in barber_ids]
+    keys, result, missing = await sync_to_async(_get_cached_slots)(barber_ids, start_date, end_date, duration)
+    days = await aload_days(*_missing_range(missing)) if missing else {}
+    await sync_to_async(_store_slots)(keys, result, missing, days, duration)
+    return result
+
+
+def invalidate_day(barber_id, date):
+    """Drop cached availability of a barber on a date."""
+    bump_version(day_namespace(barber_id, date))
+
+
+def invalidate_barber(barber_id):
+    """Drop cached availability of a barber on every date."""
+    bump_version(barber_namespace(barber_id))
+
+
+def invalidate_all():
+    """Drop all cached availability, e.g. when service durations change."""
+    bump_version(AVAILABILITY_CACHE)
@@ -0,0 +1,80 @@
+"""
+Helpers for versioned cache keys and hit/miss counters.
+
+Cached values embed the versions of the namespaces they depend on in their key.
+Invalidating a namespace replaces its version with a fresh token, which makes every
+key built from the old version unreachable without having to enumerate them.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_PREFIX = 'version:'
+STATS_PREFIX = 'stats:'
+
+
+def _new_token():
+    return time.time_ns()
+
+
+def get_versions(names):
+    """
+    Returns the current version token of each namespace, creating missing ones.
+
+    Args:
+        names (list): Namespace names.
+
+    Returns:
+        dict: Version token keyed by namespace name.
+    """
+    keys = {VERSION_PREFIX + name: name for name in names}
+    found = cache.get_many(keys)
+    versions = {keys[key]: value for key, value in found.items()}
+    for key, name in keys.items():
+        if name not in versions:
+            token = _new_token()
+            cache.add(key, token, timeout=None)
+            versions[name] = cache.get(key, token)
+    return versions
+
+
+def bump_version(*names):
+    """Invalidate everything cached under the given namespaces."""
+    token = _new_token()
+    cache.set_many({VERSION_PREFIX + name: token for name in names}, timeout=None)
+
+
+def table_namespace(model):
+    """Namespace of everything cached from the rows of ``model``'s table."""
+    return f'table:{model._meta.db_table}'
+
+
+def make_key(*parts):
+    """Join key parts with ``:``."""
+    return ':'.join(str(part) for part in parts)
+
+
+def record_stats(name, hits=0, misses=0):
+    """Add to the hit and miss counters of a cache."""
+    for counter, value in (('hits', hits), ('misses', misses)):
+        if value:
+            key = make_key(STATS_PREFIX + name, counter)
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                # The counter was evicted between add and incr
+                cache.set(key, value, timeout=None)
+
+
+def get_stats(name):
+    """Returns the hit and miss counters of a cache and its hit ratio."""
+    hits = cache.get(make_key(STATS_PREFIX + name, 'hits'), 0)
+    misses = cache.get(make_key(STATS_PREFIX + name, 'misses'), 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'ratio': hits / total if total else None}
+
+
+def reset_stats(name):
+    """Reset the hit and miss counters of a cache."""
+    cache.delete_many([make_key(STATS_PREFIX + name, 'hits'), make_key(STATS_PREFIX + name, 'misses')])
@@ -0,0 +1,359 @@
+"""
+Cache backends of the app, configured in ``CACHES``.
+
+``SQLiteCache`` stores entries in an SQLite file, so that every worker process on a host
+shares one cache. ``TieredCache`` keeps recently used entries in an in-process LRU in front
+of such a shared cache, so hot keys do not even pay for the SQLite lookup.
+
+Entries cached under versioned keys (see ``api.cache``) never go stale: invalidating
+bumps the version and changes the key. Only the version tokens themselves can be stale
+in the LRU of another process, for at most their local timeout, which is therefore short.
+"""
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Rows per statement when reading or deleting many keys, below SQLite's variable limit
+CHUNK_SIZE = 500
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache stored in an SQLite file, shared by the processes that use the same ``LOCATION``.
+
+    Uses its own ``sqlite3`` connections rather than the ORM, so it also works in async views.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    # Writes between two culls of expired and surplus entries
+    cull_every = 200
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+            self._local.connection = connection
+        return connection
+
+    def _loads(self, value, expires, now):
+        if expires is not None and expires <= now:
+            return None, False
+        return pickle.loads(value), True
+
+    def _written(self, count=1):
+        self._writes += count
+        if self._writes >= self.cull_every:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection
+        connection.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            # Drop the entries closest to expiring, those without expiry go last
+            surplus = count - self._max_entries + count // self._cull_frequency
+            connection.execute(
+                'DELETE FROM cache WHERE key IN '
+                '(SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)', (surplus,))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, pickle.dumps(value, self.pickle_protocol), self.get_backend_timeout(timeout), time.time()),
+        )
+        self._written()
+        return cursor.rowcount > 0
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        value, found = self._loads(*row, time.time())
+        return value if found else default
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        made = list(keys)
+        now = time.time()
+        result = {}
+        for start in range(0, len(made), CHUNK_SIZE):
+            chunk = made[start:start + CHUNK_SIZE]
+            rows = self._connection.execute(
+                f'SELECT key, value, expires FROM cache WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+            for made_key, value, expires in rows:
+                value, found = self._loads(value, expires, now)
+                if found:
+                    result[keys[made_key]] = value
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, self.pickle_protocol), self.get_backend_timeout(timeout)),
+        )
+        self._written()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self.make_and_validate_key(key, version=version), pickle.dumps(value, self.pickle_protocol), expires)
+                for key, value in data.items()]
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', rows)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._written(len(rows))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+            value, found = self._loads(*row, time.time()) if row else (None, False)
+            if not found:
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            connection.execute('UPDATE cache SET value = ? WHERE key = ?',
+                               (pickle.dumps(value, self.pickle_protocol), key))
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_and_validate_key(key, version=version) for key in keys]
+        for start in range(0, len(made), CHUNK_SIZE):
+            chunk = made[start:start + CHUNK_SIZE]
+            self._connection.execute(f'DELETE FROM cache WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Connections are kept open per thread for the life of the process
+        pass
+
+
+# In-process LRU entries of each TieredCache, keyed by alias and shared by the threads of a process
+_local_entries = {}
+_local_locks = {}
+
+
+class TieredCache(BaseCache):
+    """
+    In-process LRU with a TTL in front of a shared cache, given by its alias in ``SHARED_ALIAS``.
+
+    Writes go to both tiers and reads fall back to the shared tier. Entries are kept
+    locally for ``LOCAL_TIMEOUT`` seconds at most, or for the timeout of the first
+    matching prefix in ``LOCAL_TIMEOUTS``, where 0 bypasses the local tier.
+    ``MAX_ENTRIES`` bounds the local tier.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self._local_timeouts = list(options.get('LOCAL_TIMEOUTS', {}).items())
+        name = location or 'default'
+        self._entries = _local_entries.setdefault(name, OrderedDict())
+        self._lock = _local_locks.setdefault(name, threading.Lock())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_ttl(self, key, timeout):
+        ttl = self._local_timeout
+        for prefix, prefix_ttl in self._local_timeouts:
+            if key.startswith(prefix):
+                ttl = prefix_ttl
+                break
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        return ttl if timeout is None else min(ttl, timeout)
+
+    def _local_get(self, made_key, now):
+        entry = self._entries.get(made_key)
+        if entry is None:
+            return None, False
+        if entry[1] <= now:
+            del self._entries[made_key]
+            return None, False
+        self._entries.move_to_end(made_key)
+        return pickle.loads(entry[0]), True
+
+    def _local_set(self, key, value, timeout, version, now):
+        ttl = self._local_ttl(key, timeout)
+        made_key = self.make_and_validate_key(key, version=version)
+        if ttl <= 0:
+            self._entries.pop(made_key, None)
+            return
+        self._entries[made_key] = (pickle.dumps(value, self.pickle_protocol), now + ttl)
+        self._entries.move_to_end(made_key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def _local_delete(self, keys, version):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(self.make_and_validate_key(key, version=version), None)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            with self._lock:
+                self._local_set(key, value, timeout, version, time.monotonic())
+        else:
+            # Another process holds the key, read it from the shared tier next time
+            self._local_delete([key], version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for key in keys:
+                value, found = self._local_get(self.make_and_validate_key(key, version=version), now)
+                if found:
+                    result[key] = value
+        missing = [key for key in keys if key not in result]
+        if missing:
+            found = self.shared.get_many(missing, version=version)
+            with self._lock:
+                for key, value in found.items():
+                    # The remaining lifetime in the shared tier is unknown, the local TTL bounds it
+                    self._local_set(key, value, DEFAULT_TIMEOUT, version, now)
+            result.update(found)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        with self._lock:
+            self._local_set(key, value, timeout, version, time.monotonic())
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        now = time.monotonic()
+        with self._lock:
+            for key, value in data.items():
+                if key not in failed:
+                    self._local_set(key, value, timeout, version, now)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete([key], version)
+        return self.shared.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete([key], version)
+        return self.shared.incr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        with self._lock:
+            _, found = self._local_get(self.make_and_validate_key(key, version=version), time.monotonic())
+        return found or self.shared.has_key(key, version)
+
+    def delete(self, key, version=None):
+        self._local_delete([key], version)
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._local_delete(keys, version)
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop the in-process tier only, as a fresh worker process would start."""
+        with self._lock:
+            self._entries.clear()
+
+
+@contextmanager
+def isolated_caches():
+    """
+    Point the caches of the app at a throwaway location for the duration of the block, so
+    that tests and benchmarks working on a throwaway database never read entries of the
+    running app nor leave theirs behind.
+    """
+    # Imported here to keep the test utilities out of the request path
+    from django.test.utils import override_settings
+
+    directory = tempfile.mkdtemp(prefix='cache-')
+    config, local_locations = {}, []
+    for alias, options in settings.CACHES.items():
+        options = dict(options)
+        if options['BACKEND'] == f'{__name__}.SQLiteCache':
+            options['LOCATION'] = os.path.join(directory, f'{alias}.sqlite3')
+        elif options['BACKEND'] == f'{__name__}.TieredCache':
+            options['LOCATION'] = f"{options.get('LOCATION') or 'default'}:{directory}"
+            local_locations.append(options['LOCATION'])
+        config[alias] = options
+    try:
+        with override_settings(CACHES=config):
+            yield
+    finally:
+        for location in local_locations:
+            _local_entries.pop(location, None)
+            _local_locks.pop(location, None)
+        shutil.rmtree(directory, ignore_errors=True)
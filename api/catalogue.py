@@ -0,0 +1,89 @@
+"""
+Conditional GET support and payload caching for the catalogue endpoints.
+
+Services, barbers and their qualifications rarely change but are fetched on every page
+load. Each table has a version that the model signals bump on save and delete; ETags,
+Last-Modified dates and cached payloads are derived from the versions of the tables a
+response is built from, so an unchanged catalogue costs no database query.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from api.cache import bump_version, get_versions, make_key, table_namespace
+
+CATALOGUE_CACHE = 'catalogue'
+# Payloads are versioned by their tables, the timeout only bounds memory use
+CATALOGUE_TIMEOUT = 60 * 60
+# How long browsers may reuse a response before revalidating it
+CATALOGUE_MAX_AGE = 60
+
+
+def invalidate_table(model):
+    """Invalidate the ETags and cached payloads of every response built from ``model``."""
+    bump_version(table_namespace(model))
+
+
+def get_table_versions(models):
+    """Returns the version tokens of the tables of ``models``, in the same order."""
+    namespaces = [table_namespace(model) for model in models]
+    versions = get_versions(namespaces)
+    return [versions[namespace] for namespace in namespaces]
+
+
+def get_etag(models, *parts):
+    """
+    ETag of a response built from ``models``.
+
+    Args:
+        models (list): Models the response is built from.
+        *parts: Anything else the response depends on, such as query parameters.
+    """
+    key = make_key(*get_table_versions(models), *parts)
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def get_last_modified(models):
+    """Time the most recent of the tables of ``models`` changed, as far as the cache knows."""
+    # Version tokens are nanosecond timestamps of the last invalidation
+    return datetime.fromtimestamp(max(get_table_versions(models)) / 1e9, tz=timezone.utc)
+
+
+async def aget_etag(models, *parts):
+    """Async version of ``get_etag``, reading the versions off the event loop."""
+    return await sync_to_async(get_etag)(models, *parts)
+
+
+async def aget_last_modified(models):
+    """Async version of ``get_last_modified``, reading the versions off the event loop."""
+    return await sync_to_async(get_last_modified)(models)
+
+
+def get_payload(models, parts, build):
+    """
+    Returns the serialized payload of a response built from ``models``, calling ``build``
+    only if it is not cached for the current table versions.
+
+    Args:
+        models (list): Models the payload is built from.
+        parts (list): Anything else the payload depends on, such as query parameters.
+        build (callable): Builds the payload.
+    """
+    key = make_key(CATALOGUE_CACHE, get_etag(models, *parts))
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, CATALOGUE_TIMEOUT)
+    return payload
+
+
+async def aget_payload(models, parts, build):
+    """Async version of ``get_payload``, ``build`` is a coroutine function."""
+    key = make_key(CATALOGUE_CACHE, await aget_etag(models, *parts))
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = await build()
+        await cache.aset(key, payload, CATALOGUE_TIMEOUT)
+    return payload
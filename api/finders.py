@@ -0,0 +1,35 @@
+"""
+Static file finders of the app, configured in ``STATICFILES_FINDERS``.
+"""
+from importlib.util import find_spec
+from pathlib import Path
+
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.files.storage import FileSystemStorage
+
+
+class PlotlyFinder(BaseFinder):
+    """
+    Serves plotly.js from the installed plotly package as ``plotly/plotly.min.js``, so the
+    admin chart uses the version the reports are built with. Only that file is exposed,
+    not the datasets and templates that share its directory.
+    """
+    prefix = 'plotly'
+    name = 'plotly.min.js'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.storage = FileSystemStorage(
+            location=Path(find_spec('plotly').submodule_search_locations[0]) / 'package_data')
+        # Makes collectstatic copy the file under the prefix
+        self.storage.prefix = self.prefix
+
+    def find(self, path, all=False, **kwargs):
+        if path != f'{self.prefix}/{self.name}':
+            # No match is an empty list, as with Django's finders
+            return []
+        match = self.storage.path(self.name)
+        return [match] if all else match
+
+    def list(self, ignore_patterns):
+        yield self.name, self.storage
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.availability import AVAILABILITY_CACHE
+from api.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Print the hit and miss counters of the availability cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them.')
+
+    def handle(self, *args, **options):
+        stats = get_stats(AVAILABILITY_CACHE)
+        ratio = 'n/a' if stats['ratio'] is None else f"{stats['ratio']:.1%}"
+        self.stdout.write(f"hits: {stats['hits']}  misses: {stats['misses']}  hit ratio: {ratio}")
+        if options['reset']:
+            reset_stats(AVAILABILITY_CACHE)
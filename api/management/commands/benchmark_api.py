@@ -0,0 +1,139 @@
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from api.cache_backends import isolated_caches
+from api.models.models import Barber, BarberQualification, Service
+from api.seeding import seed_shop
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def percentile(samples, percent):
+    """Nearest-rank percentile of sorted samples."""
+    index = max(0, min(len(samples) - 1, round(percent / 100 * len(samples) + 0.5) - 1))
+    return samples[index]
+
+
+def summarize(values):
+    ordered = sorted(values)
+    summary = {f'p{percent}': round(percentile(ordered, percent), 3) for percent in PERCENTILES}
+    summary.update(mean=round(statistics.fmean(ordered), 3), max=round(ordered[-1], 3))
+    return summary
+
+
+def get_request_urls(count, rng):
+    """Returns ``count`` URLs per endpoint, with parameters drawn like a booking page would."""
+    service_ids = list(Service.objects.values_list('id', flat=True))
+    barber_ids = list(Barber.objects.values_list('id', flat=True))
+    qualified = {}
+    for barber_id, service_id in BarberQualification.objects.values_list('user_id', 'service_id'):
+        qualified.setdefault(barber_id, []).append(service_id)
+
+    def booking_params():
+        barber_id = rng.choice(barber_ids)
+        return barber_id, rng.choice(qualified[barber_id])
+
+    def time_slots():
+        barber_id, service_id = booking_params()
+        day = date.today() + timedelta(days=rng.randrange(30))
+        return f'/api/available-time-slots?barber_id={barber_id}&service_id={service_id}&date={day}'
+
+    def blocked_dates():
+        barber_id, service_id = booking_params()
+        return f'/api/blocked-dates?barber_id={barber_id}&service_id={service_id}'
+
+    return {
+        'services': ['/api/services'] * count,
+        'qualified-barbers': [f'/api/qualified-barbers?service_id={rng.choice(service_ids)}'
+                              for _ in range(count)],
+        'blocked-dates': [blocked_dates() for _ in range(count)],
+        'available-time-slots': [time_slots() for _ in range(count)],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway database with a synthetic shop and measure latency percentiles and query counts '
+            'of the public booking API through the test client, as a JSON report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=10)
+        parser.add_argument('--services', type=int, default=8)
+        parser.add_argument('--customers', type=int, default=500)
+        parser.add_argument('--days', type=int, default=180,
+                            help='Days of bookings, half of them before and half after today.')
+        parser.add_argument('--time-off-rate', type=float, default=0.05)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Work on a fresh test database and throwaway caches so the configured ones are never touched
+        with isolated_caches():
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                start_date = date.today() - timedelta(days=options['days'] // 2)
+                counts = seed_shop(
+                    barbers=options['barbers'], services=options['services'], customers=options['customers'],
+                    days=options['days'], time_off_rate=options['time_off_rate'], start_date=start_date,
+                    seed=options['seed'],
+                )
+                cache.clear()
+                report = {
+                    'environment': {
+                        'python': platform.python_version(),
+                        'django': django.get_version(),
+                        'database': connection.vendor,
+                    },
+                    'options': {name: options[name] for name in
+                                ('barbers', 'services', 'customers', 'days', 'time_off_rate', 'requests', 'seed')},
+                    'rows': counts,
+                    'endpoints': self.measure(options['requests'], random.Random(options['seed'])),
+                }
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def measure(self, count, rng):
+        client = Client()
+        results = {}
+        for name, urls in get_request_urls(count, rng).items():
+            latencies, queries, statuses = [], [], {}
+            for url in urls:
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                queries.append(len(context))
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            results[name] = {
+                'requests': len(urls),
+                'status_codes': {str(code): number for code, number in sorted(statuses.items())},
+                'latency_ms': summarize(latencies),
+                # The first request of each endpoint runs with a cold cache
+                'cold_latency_ms': round(latencies[0], 3),
+                'queries': summarize(queries),
+            }
+            self.stderr.write(f"{name:<22} p50 {results[name]['latency_ms']['p50']:8.3f} ms, "
+                              f"p95 {results[name]['latency_ms']['p95']:8.3f} ms, "
+                              f"{results[name]['queries']['mean']:.1f} queries")
+        return results
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.cache_backends import isolated_caches
+from api.management.commands.benchmark_api import get_request_urls, summarize
+from api.seeding import seed_shop
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway database and compare the throughput of the read-only endpoints served by the sync '
+            'views through the WSGI handler with a thread pool, and by the async views through the ASGI handler.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=10)
+        parser.add_argument('--days', type=int, default=180,
+                            help='Days of bookings, half of them before and half after today.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint and path.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Work on a fresh test database and throwaway caches so the configured ones are never touched
+        with isolated_caches():
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                seed_shop(barbers=options['barbers'], days=options['days'], seed=options['seed'],
+                          start_date=date.today() - timedelta(days=options['days'] // 2))
+                urls = [url for endpoint_urls in get_request_urls(options['requests'], random.Random(options['seed']))
+                        .values() for url in endpoint_urls]
+                random.Random(options['seed']).shuffle(urls)
+                async_urls = ['/api/async/' + url[len('/api/'):] for url in urls]
+
+                cache.clear()
+                wsgi = self.run_wsgi(urls, options['concurrency'])
+                cache.clear()
+                asgi = asyncio.run(self.run_asgi(async_urls, options['concurrency']))
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        report = {
+            'options': {name: options[name] for name in ('barbers', 'days', 'requests', 'concurrency', 'seed')},
+            'wsgi': wsgi,
+            'asgi': asgi,
+        }
+        for name in ('wsgi', 'asgi'):
+            self.stderr.write(f"{name}: {report[name]['requests_per_second']:8.1f} req/s, "
+                              f"p50 {report[name]['latency_ms']['p50']:8.3f} ms, "
+                              f"p95 {report[name]['latency_ms']['p95']:8.3f} ms")
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def result(latencies, statuses, elapsed):
+        return {
+            'requests': len(latencies),
+            'status_codes': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'latency_ms': summarize(latencies),
+        }
+
+    def run_wsgi(self, urls, concurrency):
+        """Sync views, one thread and database connection per concurrent request like a threaded WSGI server."""
+        def worker(chunk):
+            client = Client()
+            samples = []
+            try:
+                for url in chunk:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    samples.append(((time.perf_counter() - start) * 1000, response.status_code))
+            finally:
+                connections.close_all()
+            return samples
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            chunks = list(pool.map(worker, [urls[i::concurrency] for i in range(concurrency)]))
+        elapsed = time.perf_counter() - start
+        samples = [sample for chunk in chunks for sample in chunk]
+        return self.result([latency for latency, _ in samples], [status for _, status in samples], elapsed)
+
+    async def run_asgi(self, urls, concurrency):
+        """Async views on one event loop, with at most ``concurrency`` requests in flight."""
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(url):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                return (time.perf_counter() - start) * 1000, response.status_code
+
+        start = time.perf_counter()
+        samples = await asyncio.gather(*(request(url) for url in urls))
+        elapsed = time.perf_counter() - start
+        return self.result([latency for latency, _ in samples], [status for _, status in samples], elapsed)
@@ -0,0 +1,91 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.cache_backends import isolated_caches
+from api.models.enums import BookingStatus
+from api.models.models import BarberSchedule, Booking, TimeOffRequest
+from api.seeding import seed_shop
+
+INDEXED_MODELS = [Booking, TimeOffRequest]
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway database and compare query plans and timings of the booking hot-path '
+            'queries without and with the composite indexes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=30)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--repeat', type=int, default=50, help='Executions per query and phase.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Work on a fresh test database and throwaway caches so the configured ones are never touched
+        with isolated_caches():
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.stdout.write('Seeding...')
+                counts = seed_shop(barbers=options['barbers'], days=options['days'], seed=options['seed'])
+                self.stdout.write(', '.join(f'{count} {name}' for name, count in counts.items()))
+
+                queries = self.get_queries(options['days'])
+                self.drop_indexes()
+                before = self.measure(queries, options['repeat'], 'Without indexes')
+                self.create_indexes()
+                after = self.measure(queries, options['repeat'], 'With indexes')
+
+                self.stdout.write('\nSummary (median ms)')
+                for name in queries:
+                    speedup = before[name] / after[name] if after[name] else float('inf')
+                    self.stdout.write(f'  {name:<24} {before[name]:>9.3f} -> {after[name]:>9.3f}  ({speedup:.1f}x)')
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def get_queries(self, days):
+        booking = Booking.objects.order_by('booking_date').first()
+        barber_id, day = booking.barber_id, booking.booking_date
+        start, end = day, day + timedelta(days=min(days, 30))
+        return {
+            'barber day bookings': Booking.objects.filter(barber_id=barber_id, booking_date=day)
+            .values_list('start_time', 'duration_minutes'),
+            'barber month bookings': Booking.objects.filter(barber_id=barber_id, booking_date__range=(start, end))
+            .values_list('booking_date', 'start_time', 'duration_minutes'),
+            'approved time off': TimeOffRequest.objects.filter(
+                barber_id=barber_id, date__range=(start, end), isApproved=True).values_list('date', 'start_time'),
+            'barber schedule': BarberSchedule.objects.filter(barber_id=barber_id, day_of_week=day.strftime('%A')),
+            'report range by status': Booking.objects.filter(
+                booking_date__range=(start, end), status__in=[BookingStatus.CONFIRMED, BookingStatus.COMPLETED]
+            ).values_list('id', 'barber_id'),
+        }
+
+    def measure(self, queries, repeat, title):
+        self.stdout.write(f'\n== {title} ==')
+        timings = {}
+        for name, queryset in queries.items():
+            self.stdout.write(f'\n{name}\n{queryset.explain()}')
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = statistics.median(samples)
+            self.stdout.write(f'median {timings[name]:.3f} ms over {repeat} runs')
+        return timings
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,47 @@
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.cache_backends import isolated_caches
+from api.models.models import Barber
+from api.seeding import seed_shop
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database with synthetic bookings and time the Barber changelist earnings report.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=15)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--repeat', type=int, default=5, help='Report computations per range.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Work on a fresh test database and throwaway caches so the configured ones are never touched
+        with isolated_caches():
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                start_date = date.today() - timedelta(days=options['days'])
+                counts = seed_shop(barbers=options['barbers'], days=options['days'], start_date=start_date,
+                                   seed=options['seed'])
+                self.stdout.write(f"Seeded {counts['bookings']} bookings for {counts['barbers']} barbers")
+
+                barber_admin = admin.site._registry[Barber]
+                for days in (7, 31, 92, options['days']):
+                    end_date = start_date + timedelta(days=days - 1)
+                    samples = []
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        barber_admin.get_report_data(start_date, end_date)
+                        barber_admin.get_report_figure(start_date, end_date)
+                        samples.append((time.perf_counter() - start) * 1000)
+                    self.stdout.write(
+                        f'{days:>4} days: median {statistics.median(samples):9.1f} ms, '
+                        f'min {min(samples):9.1f} ms over {options["repeat"]} runs'
+                    )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
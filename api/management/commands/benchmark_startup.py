@@ -0,0 +1,77 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SETUP = 'import django; django.setup(); '
+
+# What a fresh process imports before it can serve the given path
+SCENARIOS = {
+    'django.setup()': SETUP,
+    'API (URLconf)': SETUP + 'import bsBack.urls, api.views',
+    'API + earnings report': SETUP + 'import bsBack.urls, api.views, api.reports',
+}
+
+HEAVY_MODULES = ['pandas', 'numpy', 'plotly']
+
+
+class Command(BaseCommand):
+    help = ('Measure the cold start of fresh processes with python -X importtime, for the API-only path and '
+            'with the pandas/plotly earnings report loaded.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Processes started per scenario.')
+        parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports listed per scenario.')
+        parser.add_argument('--output', help='Also write the report to this file.')
+
+    def handle(self, *args, **options):
+        lines = [f'Python {sys.version.split()[0]}, median of {options["repeat"]} cold starts per scenario', '']
+        for name, code in SCENARIOS.items():
+            walls, imports = [], []
+            for _ in range(options['repeat']):
+                wall, timings = self.run(code)
+                walls.append(wall)
+                imports.append(sum(self_us for self_us, _, _ in timings) / 1000)
+            loaded = {module.strip() for _, _, module in timings}
+            heavy = [module for module in HEAVY_MODULES if module in loaded] or ['none']
+            lines.append(f'== {name} ==')
+            lines.append(f'wall {statistics.median(walls):8.1f} ms, imports {statistics.median(imports):8.1f} ms, '
+                         f'{len(loaded)} modules, heavy: {", ".join(heavy)}')
+            top_level = sorted((timing for timing in timings if not timing[2].startswith(' ')),
+                               key=lambda timing: timing[1], reverse=True)
+            for _, cumulative, module in top_level[:options['top']]:
+                lines.append(f'  {cumulative / 1000:8.1f} ms  {module}')
+            lines.append('')
+
+        report = '\n'.join(lines)
+        self.stdout.write(report)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+
+    @staticmethod
+    def run(code):
+        """
+        Run ``code`` in a fresh interpreter with ``-X importtime``.
+
+        Returns:
+            tuple: Wall time in milliseconds and ``(self_us, cumulative_us, module)`` per import,
+                where nested imports keep their leading spaces.
+        """
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'bsBack.settings'))
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True)
+        wall = (time.perf_counter() - start) * 1000
+
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            self_us, cumulative_us, module = line[len('import time:'):].split('|', 2)
+            timings.append((int(self_us), int(cumulative_us), module[1:]))
+        return wall, timings
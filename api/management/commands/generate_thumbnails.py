@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from api import catalogue
+from api.models.models import Barber
+from api.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generate the profile image thumbnails of barbers whose images were uploaded before thumbnails existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate thumbnails that already exist.')
+
+    def handle(self, *args, **options):
+        barbers = Barber.objects.exclude(profileImage='').exclude(profileImage__isnull=True)
+        if not options['force']:
+            barbers = barbers.filter(profileThumbnails={})
+
+        count = 0
+        for barber in barbers.iterator():
+            try:
+                thumbnails = generate_thumbnails(barber.profileImage)
+            except (OSError, ValueError) as e:
+                self.stderr.write(f'{barber}: {e}')
+                continue
+            # update() skips the signals, the catalogue is invalidated once at the end instead
+            Barber.objects.filter(pk=barber.pk).update(profileThumbnails=thumbnails)
+            count += 1
+
+        catalogue.invalidate_table(Barber)
+        self.stdout.write(self.style.SUCCESS(f'Generated thumbnails for {count} barbers.'))
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from api.models.models import Booking, DailyBarberEarnings
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyBarberEarnings rollup from the bookings, for a date range or for all bookings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=parse_date, help='First date to rebuild, YYYY-MM-DD.')
+        parser.add_argument('--end-date', type=parse_date, help='Last date to rebuild, YYYY-MM-DD.')
+        parser.add_argument('--barber', type=int, action='append', dest='barber_ids', help='Only rebuild this barber.')
+
+    def handle(self, *args, **options):
+        bounds = Booking.objects.aggregate(first=Min('booking_date'), last=Max('booking_date'))
+        start_date = options['start_date'] or bounds['first']
+        end_date = options['end_date'] or bounds['last']
+        if start_date is None or end_date is None:
+            self.stdout.write('No bookings to roll up.')
+            return
+        if end_date < start_date:
+            raise CommandError('--end-date must not be before --start-date.')
+
+        count = DailyBarberEarnings.rebuild(start_date, end_date, barber_ids=options['barber_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rollup rows from {start_date} to {end_date}.'))
@@ -0,0 +1,51 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.seeding import seed_shop
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = ('Fill the configured database with a synthetic shop: users with their information, barbers, schedules, '
+            'qualifications, services, bookings with their services and time off. The number of bookings is about '
+            'barbers x working days x bookings per day, e.g. 500 barbers over 730 days make ~2.5 million.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbers', type=int, default=10)
+        parser.add_argument('--services', type=int, default=8)
+        parser.add_argument('--customers', type=int, default=200)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--bookings-per-day', type=int, default=8, help='Per barber and working day, at most 8.')
+        parser.add_argument('--time-off-rate', type=float, default=0.05)
+        parser.add_argument('--start-date', type=parse_date,
+                            help='First day of bookings, YYYY-MM-DD. Defaults to --days days before today.')
+        parser.add_argument('--seed', type=int, default=0, help='The same seed and options produce the same rows.')
+        parser.add_argument('--prefix', default='seed', help='Prefix of the usernames, to seed several shops.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if min(options['barbers'], options['services'], options['customers']) < 1:
+            raise CommandError('--barbers, --services and --customers must be at least 1.')
+
+        start = time.perf_counter()
+        counts = seed_shop(
+            barbers=options['barbers'],
+            services=options['services'],
+            customers=options['customers'],
+            days=options['days'],
+            bookings_per_day=options['bookings_per_day'],
+            time_off_rate=options['time_off_rate'],
+            start_date=options['start_date'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        for name, count in counts.items():
+            self.stdout.write(f'{name:<20} {count:>10}')
+        self.stdout.write(self.style.SUCCESS(f'Seeded in {time.perf_counter() - start:.1f} s.'))
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_alter_barber_agreedmargin'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='service',
+            name='image',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_remove_service_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='barber',
+            name='position',
+            field=models.CharField(default='Senior Barber', max_length=40, null=True, verbose_name="Barber's Position"),
+        ),
+    ]
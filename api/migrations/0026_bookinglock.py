@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_barber_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('locked_at', models.DateTimeField(auto_now=True)),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.barber')),
+            ],
+            options={
+                'verbose_name': 'Booking Lock',
+                'verbose_name_plural': 'Booking Locks',
+                'constraints': [models.UniqueConstraint(fields=('barber', 'date'), name='unique_barber_date_lock')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_bookinglock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['barber', 'booking_date', 'start_time'], name='booking_barber_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_date', 'status'], name='booking_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeoffrequest',
+            index=models.Index(fields=['barber', 'date', 'isApproved'], name='timeoff_barber_date_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:14
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+
+def add_minutes(value, minutes):
+    start = datetime.datetime.combine(datetime.date.min, value)
+    end = start + datetime.timedelta(minutes=minutes)
+    return end.time() if end.date() == start.date() else datetime.time.max
+
+
+def backfill_duration(apps, schema_editor):
+    Booking = apps.get_model('api', 'Booking')
+    bookings = Booking.objects.annotate(total=Coalesce(Sum('selectedservice__service__duration'), 0))
+    batch = []
+    for booking in bookings.iterator(chunk_size=2000):
+        booking.duration_minutes = booking.total
+        booking.end_time = add_minutes(booking.start_time, booking.total)
+        batch.append(booking)
+        if len(batch) >= 2000:
+            Booking.objects.bulk_update(batch, ['duration_minutes', 'end_time'])
+            batch = []
+    Booking.objects.bulk_update(batch, ['duration_minutes', 'end_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_booking_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_barber_date_idx',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Total duration of the selected services in minutes, kept in sync with the selected services.', verbose_name='Duration'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='end_time',
+            field=models.TimeField(editable=False, help_text='Start time plus the duration of the selected services.', null=True, verbose_name='End Time'),
+        ),
+        migrations.RunPython(backfill_duration, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['barber', 'booking_date', 'start_time', 'duration_minutes'], name='booking_barber_date_idx'),
+        ),
+    ]
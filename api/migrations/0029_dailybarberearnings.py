@@ -0,0 +1,66 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def build_rollup(apps, schema_editor):
+    Booking = apps.get_model('api', 'Booking')
+    DailyBarberEarnings = apps.get_model('api', 'DailyBarberEarnings')
+    price = F('selectedservice__service__price')
+    margin = F('barber__agreedMargin')
+    statuses = {'pending': 'pending', 'confirmed': 'confirmed', 'completed': 'completed',
+                'cancelled': 'cancelled', 'no_show': 'noShow'}
+    rows = Booking.objects.values('barber_id', 'booking_date').annotate(
+        total=Count('id', distinct=True),
+        gross_sum=Coalesce(Sum(price), Value(0.0)),
+        barber_sum=Coalesce(Sum(price * margin / Value(100.0), output_field=models.FloatField()), Value(0.0)),
+        shop_sum=Coalesce(Sum(price * (Value(100) - margin) / Value(100.0), output_field=models.FloatField()),
+                          Value(0.0)),
+        billable_sum=Coalesce(Sum(price, filter=Q(status__in=['confirmed', 'completed'])), Value(0.0)),
+        **{f'{field}_count': Count('id', filter=Q(status=status), distinct=True) for field, status in statuses.items()},
+    ).order_by()
+    DailyBarberEarnings.objects.bulk_create([
+        DailyBarberEarnings(
+            barber_id=row['barber_id'], date=row['booking_date'], bookings=row['total'], gross=row['gross_sum'],
+            barber_cut=row['barber_sum'], shop_cut=row['shop_sum'], billable_gross=row['billable_sum'],
+            **{field: row[f'{field}_count'] for field in statuses},
+        ) for row in rows
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_booking_duration_minutes_end_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBarberEarnings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bookings', models.PositiveIntegerField(default=0, verbose_name='Bookings')),
+                ('gross', models.FloatField(default=0, verbose_name='Gross Earnings')),
+                ('barber_cut', models.FloatField(default=0, verbose_name="Barber's Cut")),
+                ('shop_cut', models.FloatField(default=0, verbose_name="Shop's Cut")),
+                ('billable_gross', models.FloatField(default=0, help_text='Gross earnings of confirmed and completed bookings.', verbose_name='Billable Gross Earnings')),
+                ('pending', models.PositiveIntegerField(default=0)),
+                ('confirmed', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('no_show', models.PositiveIntegerField(default=0)),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_earnings', to='api.barber')),
+            ],
+            options={
+                'verbose_name': 'Daily Barber Earnings',
+                'verbose_name_plural': 'Daily Barber Earnings',
+                'indexes': [models.Index(fields=['date', 'barber'], name='daily_earnings_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('barber', 'date'), name='unique_barber_daily_earnings')],
+            },
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_dailybarberearnings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='barber',
+            name='profileThumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized copies of the profile image, file names by format and width, generated on upload.', verbose_name='Profile Image Thumbnails'),
+        ),
+    ]
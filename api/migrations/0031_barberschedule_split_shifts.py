@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:39
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_barber_profilethumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='barberschedule',
+            unique_together={('barber', 'day_of_week', 'start_time')},
+        ),
+        migrations.CreateModel(
+            name='BarberBreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day_of_week', models.CharField(blank=True, choices=[('Monday', 'Monday'), ('Tuesday', 'Tuesday'), ('Wednesday', 'Wednesday'), ('Thursday', 'Thursday'), ('Friday', 'Friday'), ('Saturday', 'Saturday'), ('Sunday', 'Sunday')], help_text='Leave empty for a break on every working day.', max_length=20, null=True)),
+                ('start_time', models.TimeField(default=datetime.time(12, 0))),
+                ('end_time', models.TimeField(default=datetime.time(13, 0))),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.barber')),
+            ],
+            options={
+                'verbose_name': 'Barber Break',
+                'verbose_name_plural': 'Barber Breaks',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:41
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_barberschedule_split_shifts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTimeOff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('weekly', 'Weekly'), ('biweekly', 'Every Two Weeks'), ('monthly', 'Monthly')], default='weekly', max_length=20)),
+                ('start_date', models.DateField(help_text='Date of the first occurrence.')),
+                ('until', models.DateField(blank=True, help_text='Date of the last possible occurrence, if any.', null=True)),
+                ('start_time', models.TimeField(default=datetime.time(0, 0))),
+                ('end_time', models.TimeField(default=datetime.time(23, 59))),
+                ('exceptions', models.JSONField(blank=True, default=list, help_text='Dates in YYYY-MM-DD format on which the time off does not apply.')),
+                ('reason', models.TextField(blank=True, null=True)),
+                ('isApproved', models.BooleanField(default=False, verbose_name='Is Approved')),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.barber')),
+            ],
+            options={
+                'verbose_name': 'Recurring Time Off',
+                'verbose_name_plural': 'Recurring Time Off',
+            },
+        ),
+    ]
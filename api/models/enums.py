@@ -33,3 +33,9 @@ class BookingStatus(models.TextChoices):
     CONFIRMED = 'confirmed', 'Confirmed'
     COMPLETED = 'completed', 'Completed'
     PENDING = 'pending', 'Pending'
+
+
+class Recurrence(models.TextChoices):
+    WEEKLY = 'weekly', 'Weekly'
+    BIWEEKLY = 'biweekly', 'Every Two Weeks'
+    MONTHLY = 'monthly', 'Monthly'
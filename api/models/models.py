@@ -1,15 +1,30 @@
 import datetime
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from datetime import time
 
-from django.db.models import Sum, F, Q, Value
-from django.db.models.functions import Concat
+from django.db.models import Sum, F, Q, Value, Count, OuterRef, Subquery
+from django.db.models.functions import Concat, Coalesce
 
+from api.cache import bump_version, table_namespace
 from api.models.validations import phoneValidation, ssnValidation, validate_duration, validate_margin
-from .enums import ProvinceChoices, Weekday, BookingStatus
+from .enums import ProvinceChoices, Weekday, BookingStatus, Recurrence
+
+
+class CachedModel(models.Model):
+    """
+    Base of the models whose rows are cached. Saving or deleting a row bumps the cache
+    version of its table (see ``api.signals``), which invalidates everything cached from it.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def invalidate_cache(cls):
+        bump_version(table_namespace(cls))
 
 
 class UserExtra(models.Model):
@@ -63,7 +78,7 @@ class UserExtra(models.Model):
         return f"{self.user.username.capitalize()}'s Information"
 
 
-class Barber(models.Model):
+class Barber(CachedModel):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -126,6 +141,14 @@ class Barber(models.Model):
         null=True
     )
 
+    profileThumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Profile Image Thumbnails",
+        help_text="Resized copies of the profile image, file names by format and width, generated on upload."
+    )
+
     def clean(self):
         """
         Ensure that the user associated with this Barber is marked as staff.
@@ -156,7 +179,7 @@ class Barber(models.Model):
         return list(data)
 
 
-class Service(models.Model):
+class Service(CachedModel):
     name = models.CharField(max_length=255, verbose_name="Service Name")
     price = models.FloatField(verbose_name="Service Price")
     description = models.TextField(verbose_name="Service Description", blank=True, null=True)
@@ -171,7 +194,7 @@ class Service(models.Model):
         return self.name
 
 
-class BarberQualification(models.Model):
+class BarberQualification(CachedModel):
     user = models.ForeignKey(
         Barber,
         on_delete=models.CASCADE,
@@ -191,19 +214,45 @@ class BarberQualification(models.Model):
         return self.service.name
 
 
-class BarberSchedule(models.Model):
+class BarberSchedule(CachedModel):
+    """A working window of a barber on a weekday, a day may have several for split shifts."""
     barber = models.ForeignKey(Barber, on_delete=models.CASCADE)
     day_of_week = models.CharField(max_length=20, choices=Weekday.choices)
     start_time = models.TimeField(default=time(9, 0))
     end_time = models.TimeField(default=time(17, 0))
 
     class Meta:
-        unique_together = ('barber', 'day_of_week')
+        unique_together = ('barber', 'day_of_week', 'start_time')
+
+    def clean(self):
+        if self.start_time is not None and self.end_time is not None and self.end_time <= self.start_time:
+            raise ValidationError("The end time must be after the start time.")
 
     def __str__(self):
         return ''
 
 
+class BarberBreak(CachedModel):
+    """A recurring break of a barber, such as lunch, on one weekday or on every working day."""
+    barber = models.ForeignKey(Barber, on_delete=models.CASCADE)
+    day_of_week = models.CharField(max_length=20, choices=Weekday.choices, blank=True, null=True,
+                                   help_text='Leave empty for a break on every working day.')
+    start_time = models.TimeField(default=time(12, 0))
+    end_time = models.TimeField(default=time(13, 0))
+    reason = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = 'Barber Break'
+        verbose_name_plural = 'Barber Breaks'
+
+    def clean(self):
+        if self.start_time is not None and self.end_time is not None and self.end_time <= self.start_time:
+            raise ValidationError("The end time must be after the start time.")
+
+    def __str__(self):
+        return f"{self.day_of_week or 'Daily'} break from {self.start_time} to {self.end_time}"
+
+
 class TimeOffRequest(models.Model):
     barber = models.ForeignKey(Barber, on_delete=models.CASCADE)
     date = models.DateField()
@@ -216,25 +265,198 @@ class TimeOffRequest(models.Model):
         unique_together = ('barber', 'date', 'start_time')
         verbose_name = 'Time Off Request'
         verbose_name_plural = 'Time Off Requests'
+        indexes = [
+            models.Index(fields=['barber', 'date', 'isApproved'], name='timeoff_barber_date_idx'),
+        ]
 
     def __str__(self):
         return f"Time Off Request for {self.date} from {self.start_time} to {self.end_time}."
 
 
+class RecurringTimeOff(CachedModel):
+    """
+    Time off repeating weekly, every two weeks or monthly from ``start_date``, so that a
+    regular day off is one row rather than one ``TimeOffRequest`` per date. Monthly rules
+    repeat on the day of the month of ``start_date`` and skip months without that day.
+    """
+    barber = models.ForeignKey(Barber, on_delete=models.CASCADE)
+    frequency = models.CharField(max_length=20, choices=Recurrence.choices, default=Recurrence.WEEKLY)
+    start_date = models.DateField(help_text='Date of the first occurrence.')
+    until = models.DateField(blank=True, null=True, help_text='Date of the last possible occurrence, if any.')
+    start_time = models.TimeField(default=time(0, 0))
+    end_time = models.TimeField(default=time(23, 59))
+    exceptions = models.JSONField(default=list, blank=True,
+                                  help_text='Dates in YYYY-MM-DD format on which the time off does not apply.')
+    reason = models.TextField(blank=True, null=True)
+    isApproved = models.BooleanField(verbose_name='Is Approved', default=False)
+
+    class Meta:
+        verbose_name = 'Recurring Time Off'
+        verbose_name_plural = 'Recurring Time Off'
+
+    def clean(self):
+        if self.start_time is not None and self.end_time is not None and self.end_time <= self.start_time:
+            raise ValidationError("The end time must be after the start time.")
+        if self.until is not None and self.start_date is not None and self.until < self.start_date:
+            raise ValidationError("The time off cannot end before its first occurrence.")
+        self.normalize_exceptions()
+
+    def normalize_exceptions(self):
+        """
+        Store ``exceptions`` as sorted, unique dates in YYYY-MM-DD format.
+
+        Raises:
+            ValidationError: If ``exceptions`` is not a list of dates.
+        """
+        try:
+            if not isinstance(self.exceptions, (list, tuple)):
+                raise TypeError
+            self.exceptions = sorted({datetime.date.fromisoformat(str(day)).isoformat() for day in self.exceptions})
+        except (TypeError, ValueError):
+            raise ValidationError({'exceptions': "Exceptions must be a list of dates in YYYY-MM-DD format."})
+
+    def save(self, *args, **kwargs):
+        # Rows saved outside of forms are checked too, the availability engine parses every rule
+        self.normalize_exceptions()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.get_frequency_display()} time off from {self.start_date}, {self.start_time} to {self.end_time}."
+
+
+# Bookings that count towards expected earnings
+BILLABLE_STATUSES = [BookingStatus.CONFIRMED, BookingStatus.COMPLETED]
+
+
+class BookingQuerySet(models.QuerySet):
+    def with_total_duration(self):
+        """
+        Annotate each booking with ``total_duration``, the summed duration in minutes
+        of its selected services, computed in a single aggregated query.
+        """
+        return self.annotate(total_duration=Coalesce(Sum('selectedservice__service__duration'), 0))
+
+    def sync_durations(self):
+        """
+        Recompute ``duration_minutes`` and ``end_time`` of the bookings from their selected
+        services, like ``Booking.sync_duration`` but in a fixed number of queries.
+        """
+        totals = SelectedService.objects.filter(appointment=OuterRef('pk')).values('appointment').annotate(
+            total=Sum('service__duration')).values('total')
+        self.update(duration_minutes=Coalesce(Subquery(totals), 0))
+        bookings = [
+            self.model(pk=pk, end_time=add_minutes(start_time, duration_minutes))
+            for pk, start_time, duration_minutes in self.values_list('pk', 'start_time', 'duration_minutes')
+        ]
+        self.model.objects.bulk_update(bookings, ['end_time'], batch_size=500)
+
+    def earnings_by_day(self, start_date: datetime.date, end_date: datetime.date):
+        """
+        Earnings per day and barber between two dates, aggregated by the database.
+
+        Returns:
+            QuerySet: Dicts with ``bookingDate``, ``barberId``, ``barberName``, ``bookings``,
+            ``gross``, ``barberCut``, ``shopCut``, ``billableGross`` (confirmed and completed
+            bookings only) and a count per booking status, ordered by date and barber name.
+        """
+        price = F('selectedservice__service__price')
+        margin = F('barber__agreedMargin')
+        status_counts = {
+            f'{status}Count': Count('id', filter=Q(status=status), distinct=True) for status in BookingStatus.values
+        }
+        return self.filter(booking_date__range=(start_date, end_date)).values(
+            bookingDate=F('booking_date'),
+            barberId=F('barber_id'),
+            barberName=F('barber__user__username'),
+        ).annotate(
+            bookings=Count('id', distinct=True),
+            gross=Coalesce(Sum(price), Value(0.0)),
+            barberCut=Coalesce(Sum(price * margin / Value(100.0), output_field=models.FloatField()), Value(0.0)),
+            shopCut=Coalesce(
+                Sum(price * (Value(100) - margin) / Value(100.0), output_field=models.FloatField()), Value(0.0)),
+            billableGross=Coalesce(Sum(price, filter=Q(status__in=BILLABLE_STATUSES)), Value(0.0)),
+            **status_counts,
+        ).order_by('bookingDate', 'barberName')
+
+
+def add_minutes(value: time, minutes: int) -> time:
+    """Returns ``value`` shifted by ``minutes``, capped at the end of the day."""
+    start = datetime.datetime.combine(datetime.date.min, value)
+    end = start + datetime.timedelta(minutes=minutes)
+    return end.time() if end.date() == start.date() else time.max
+
+
 class Booking(models.Model):
     barber = models.ForeignKey(Barber, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     booking_date = models.DateField()
     start_time = models.TimeField()
     status = models.CharField(max_length=20, choices=BookingStatus.choices, default=BookingStatus.PENDING)
+    duration_minutes = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Duration",
+        help_text="Total duration of the selected services in minutes, kept in sync with the selected services."
+    )
+    end_time = models.TimeField(
+        null=True,
+        editable=False,
+        verbose_name="End Time",
+        help_text="Start time plus the duration of the selected services."
+    )
+
+    objects = BookingQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Booking Appointment'
         verbose_name_plural = 'Booking Appointments'
+        indexes = [
+            # Availability: bookings of a barber on a day, with the columns the query reads
+            models.Index(fields=['barber', 'booking_date', 'start_time', 'duration_minutes'],
+                         name='booking_barber_date_idx'),
+            # Admin report and today's columns: bookings in a date range by status
+            models.Index(fields=['booking_date', 'status'], name='booking_date_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.barber}'s Appointment with {self.user}"
 
+    def save(self, *args, **kwargs):
+        self.end_time = add_minutes(self.start_time, self.duration_minutes)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'start_time' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'end_time'}
+        super().save(*args, **kwargs)
+
+    def sync_duration(self):
+        """
+        Recompute ``duration_minutes`` and ``end_time`` from the selected services and store them.
+        """
+        self.duration_minutes = self.selectedservice_set.aggregate(
+            total=Coalesce(Sum('service__duration'), 0))['total']
+        self.end_time = add_minutes(self.start_time, self.duration_minutes)
+        Booking.objects.filter(pk=self.pk).update(duration_minutes=self.duration_minutes, end_time=self.end_time)
+
+
+class BookingLock(models.Model):
+    """
+    One row per barber and day, locked for the duration of a booking creation so that
+    concurrent creations for the same barber and day are serialized.
+    """
+    barber = models.ForeignKey(Barber, on_delete=models.CASCADE)
+    date = models.DateField()
+    locked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Booking Lock'
+        verbose_name_plural = 'Booking Locks'
+        constraints = [
+            models.UniqueConstraint(fields=['barber', 'date'], name='unique_barber_date_lock')
+        ]
+
+    def __str__(self):
+        return f"Booking lock for {self.barber} on {self.date}"
+
 
 class SelectedService(models.Model):
     appointment = models.ForeignKey(
@@ -254,3 +476,109 @@ class SelectedService(models.Model):
 
     def __str__(self):
         return f''
+
+
+class DailyBarberEarnings(models.Model):
+    """
+    Rollup of a barber's bookings and earnings on one day, refreshed whenever the bookings
+    of that day change, so that reports read one row per barber and day.
+    """
+    # Cache namespace of everything derived from the rollup, such as the admin earnings chart
+    REPORT_CACHE = 'earnings-report'
+
+    barber = models.ForeignKey(Barber, on_delete=models.CASCADE, related_name='daily_earnings')
+    date = models.DateField()
+    bookings = models.PositiveIntegerField(default=0, verbose_name="Bookings")
+    gross = models.FloatField(default=0, verbose_name="Gross Earnings")
+    barber_cut = models.FloatField(default=0, verbose_name="Barber's Cut")
+    shop_cut = models.FloatField(default=0, verbose_name="Shop's Cut")
+    billable_gross = models.FloatField(
+        default=0,
+        verbose_name="Billable Gross Earnings",
+        help_text="Gross earnings of confirmed and completed bookings."
+    )
+    pending = models.PositiveIntegerField(default=0)
+    confirmed = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    no_show = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Daily Barber Earnings"
+        verbose_name_plural = "Daily Barber Earnings"
+        constraints = [
+            models.UniqueConstraint(fields=['barber', 'date'], name='unique_barber_daily_earnings')
+        ]
+        indexes = [
+            models.Index(fields=['date', 'barber'], name='daily_earnings_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.barber}'s earnings on {self.date}"
+
+    @property
+    def billable_bookings(self):
+        return self.confirmed + self.completed
+
+    @classmethod
+    def from_row(cls, row):
+        """Build an instance from a row of ``Booking.objects.earnings_by_day``."""
+        return cls(
+            barber_id=row['barberId'],
+            date=row['bookingDate'],
+            bookings=row['bookings'],
+            gross=row['gross'],
+            barber_cut=row['barberCut'],
+            shop_cut=row['shopCut'],
+            billable_gross=row['billableGross'],
+            pending=row[f'{BookingStatus.PENDING}Count'],
+            confirmed=row[f'{BookingStatus.CONFIRMED}Count'],
+            completed=row[f'{BookingStatus.COMPLETED}Count'],
+            cancelled=row[f'{BookingStatus.CANCELLED}Count'],
+            no_show=row[f'{BookingStatus.NO_SHOW}Count'],
+        )
+
+    @classmethod
+    def refresh(cls, barber_id, date: datetime.date):
+        """Recompute the rollup row of one barber and day from its bookings."""
+        row = Booking.objects.filter(barber_id=barber_id).earnings_by_day(date, date).first()
+        if row is None:
+            cls.objects.filter(barber_id=barber_id, date=date).delete()
+            cls.invalidate_reports()
+            return
+        fresh = cls.from_row(row)
+        fields = [field.name for field in cls._meta.concrete_fields if field.name not in ('id', 'barber', 'date')]
+        cls.objects.update_or_create(
+            barber_id=barber_id, date=date, defaults={field: getattr(fresh, field) for field in fields}
+        )
+        cls.invalidate_reports()
+
+    @classmethod
+    def rebuild(cls, start_date: datetime.date, end_date: datetime.date, barber_ids=None, batch_size=2000):
+        """
+        Recompute every rollup row between two dates, optionally only for some barbers.
+
+        Returns:
+            int: Number of rollup rows written.
+        """
+        bookings = Booking.objects.all()
+        existing = cls.objects.filter(date__range=(start_date, end_date))
+        if barber_ids is not None:
+            bookings = bookings.filter(barber_id__in=barber_ids)
+            existing = existing.filter(barber_id__in=barber_ids)
+
+        rows = [cls.from_row(row) for row in bookings.earnings_by_day(start_date, end_date)]
+        with transaction.atomic():
+            existing.delete()
+            cls.objects.bulk_create(rows, batch_size=batch_size)
+        cls.invalidate_reports()
+        return len(rows)
+
+    @classmethod
+    def invalidate_reports(cls):
+        """
+        Drop cached reports now and again once the transaction commits, so that a concurrent
+        read cannot cache the rollup from before the commit under the new version.
+        """
+        bump_version(cls.REPORT_CACHE)
+        transaction.on_commit(lambda: bump_version(cls.REPORT_CACHE))
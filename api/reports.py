@@ -0,0 +1,84 @@
+"""
+Earnings reports of the Barber admin, built with pandas and plotly.
+
+Both libraries take long to import, so this module is only imported when a report
+is requested and processes serving the API never load them.
+"""
+import pandas as pd
+import plotly.graph_objs as go
+from django.db import DatabaseError
+from django.db.models import F
+
+from api.models.models import Barber, DailyBarberEarnings
+
+
+def get_earnings_frame(start_date, end_date):
+    """
+    Earnings per day and barber as a typed DataFrame with ``bookingDate``, ``barberName``,
+    ``gross``, ``barberCut`` and ``shopCut`` columns.
+
+    Rows are read from the DailyBarberEarnings rollup, one per day and barber. If the rollup
+    cannot be read, the raw booking rows are aggregated in pandas instead.
+    """
+    try:
+        df = pd.DataFrame(list(DailyBarberEarnings.objects.filter(date__range=(start_date, end_date)).values(
+            'gross',
+            bookingDate=F('date'),
+            barberName=F('barber__user__username'),
+            barberCut=F('barber_cut'),
+            shopCut=F('shop_cut'),
+        )))
+    except DatabaseError:
+        df = aggregate_earnings_rows(Barber.prepare_df_data(start_date, end_date))
+    if len(df) == 0:
+        return df
+
+    # Compact, typed columns: one category code per barber and a real date column.
+    # Amounts stay float64 so that totals over long ranges keep their cents.
+    df = df.astype({'barberName': 'category', 'gross': 'float64', 'barberCut': 'float64', 'shopCut': 'float64'})
+    df['bookingDate'] = pd.to_datetime(df['bookingDate'])
+    return df
+
+
+def aggregate_earnings_rows(rows):
+    """Fallback for ``get_earnings_frame``: aggregate one row per booking and service in pandas."""
+    df = pd.DataFrame(rows)
+    if len(df) == 0:
+        return df
+    df['servicePrice'] = df['servicePrice'].fillna(0).astype('float64')
+    df['barberMargin'] = df['barberMargin'].astype('float32')
+    df['barberCut'] = df['servicePrice'] * df['barberMargin'] / 100
+    df['shopCut'] = df['servicePrice'] * (100 - df['barberMargin']) / 100
+    return df.groupby(['bookingDate', 'barberId', 'barberName'], as_index=False).agg(
+        bookings=('bookingId', 'nunique'),
+        gross=('servicePrice', 'sum'),
+        barberCut=('barberCut', 'sum'),
+        shopCut=('shopCut', 'sum'),
+    )
+
+
+def get_report_figure(start_date, end_date):
+    """
+    Plotly figure of the earnings per day, in total and per barber, as a JSON string.
+    Returns ``None`` if there are no bookings in the date range.
+    """
+    df = get_earnings_frame(start_date, end_date)
+    if len(df) == 0:
+        return None
+
+    # One pass: earnings per day (rows) and barber (columns)
+    earnings = df.pivot_table(
+        index='bookingDate', columns='barberName', values='gross',
+        aggfunc='sum', fill_value=0, observed=True,
+    )
+    total_earnings = earnings.sum(axis=1)
+
+    traces = [go.Scatter(x=total_earnings.index, y=total_earnings.values, mode='lines', name='Total')]
+    for barber in earnings.columns:
+        traces.append(go.Scatter(x=earnings.index, y=earnings[barber].values, mode='lines', name=barber))
+    layout = go.Layout(
+        title='Projected Earnings Per Day',
+        xaxis=dict(title='Date'),
+        yaxis=dict(title='Earnings'),
+    )
+    return go.Figure(data=traces, layout=layout).to_json()
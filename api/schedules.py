@@ -0,0 +1,183 @@
+"""
+Weekly working hours and recurring time off of the barbers.
+
+The schedules of all barbers are read at once and kept as a 7-entry list per barber,
+indexed by ``date.weekday()``, so availability code never queries schedules per day or
+matches weekday names. A day may have several working windows for split shifts and
+recurring breaks, which are combined with bookings and time-off into one merged set of
+busy intervals by ``DayAvailability.from_windows``.
+
+Recurring time off is kept as rules and expanded lazily over the dates being evaluated
+only, so the rows read depend on the number of rules, not on how often they repeat.
+
+Both maps are cached under the versions of the tables they are read from, which
+``CachedModel`` bumps whenever a row is saved or deleted, and the current maps are also
+kept in memory so that reading one costs a version lookup.
+"""
+import calendar
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Value, When
+
+from api.cache import get_versions, make_key, table_namespace
+from api.models.enums import Recurrence, Weekday
+from api.models.models import BarberBreak, BarberSchedule, RecurringTimeOff
+
+SCHEDULE_CACHE = 'schedules'
+TIME_OFF_RULES_CACHE = 'time-off-rules'
+# How far ahead open-ended recurring time off is reported, e.g. as blocked dates
+RECURRING_TIME_OFF_HORIZON = timedelta(days=90)
+# Weekday names in the order of date.weekday(), Monday first
+WEEKDAYS = list(Weekday.values)
+WEEKDAY_INDEX = {day: index for index, day in enumerate(WEEKDAYS)}
+DAYS_OFF = (None,) * 7
+
+
+class WorkingDay(NamedTuple):
+    """Working windows and recurring breaks of a barber on a weekday, in minutes since midnight."""
+    windows: tuple
+    breaks: tuple = ()
+
+
+class TimeOffRule(NamedTuple):
+    """An approved ``RecurringTimeOff``, with its hours as ``(start, end)`` minutes since midnight."""
+    frequency: str
+    start_date: date
+    until: date
+    exceptions: frozenset
+    interval: tuple
+
+    def occurrences(self, start_date, end_date):
+        """
+        Yield the dates from ``start_date`` to ``end_date`` inclusive on which the time off
+        applies, computing them on the fly rather than walking from the first occurrence.
+        """
+        start_date = max(start_date, self.start_date)
+        if self.until is not None:
+            end_date = min(end_date, self.until)
+        if self.frequency == Recurrence.MONTHLY:
+            day_of_month = self.start_date.day
+            year, month = start_date.year, start_date.month
+            while date(year, month, 1) <= end_date:
+                # Months without the day of the first occurrence are skipped
+                if day_of_month <= calendar.monthrange(year, month)[1]:
+                    day = date(year, month, day_of_month)
+                    if start_date <= day <= end_date and day not in self.exceptions:
+                        yield day
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            return
+
+        step = 14 if self.frequency == Recurrence.BIWEEKLY else 7
+        day = start_date + timedelta(days=-(start_date - self.start_date).days % step)
+        while day <= end_date:
+            if day not in self.exceptions:
+                yield day
+            day += timedelta(days=step)
+
+
+# Key and value of the current version of each map, replaced when a version changes
+_current = {}
+
+
+def _get_cached(name, models, load):
+    """The value ``load`` returns, cached until a row of one of ``models`` changes."""
+    namespaces = [table_namespace(model) for model in models]
+    versions = get_versions(namespaces)
+    key = make_key(name, *(versions[namespace] for namespace in namespaces))
+    current = _current.get(name)
+    if current is None or current[0] != key:
+        value = cache.get(key)
+        if value is None:
+            value = load()
+            cache.set(key, value)
+        _current[name] = current = (key, value)
+    return current[1]
+
+
+def load_weekly_schedules():
+    """
+    Read the schedules and breaks of all barbers in one query.
+
+    Returns:
+        dict: For each barber ID, a 7-entry tuple indexed by ``date.weekday()`` holding a
+        ``WorkingDay`` with the sorted working windows and breaks as ``(start, end)``
+        minutes, or ``None`` on days off.
+    """
+    fields = ['barber_id', 'day_of_week', 'start_time', 'end_time']
+    rows = BarberSchedule.objects.values_list(*fields, Value(False)).union(
+        BarberBreak.objects.values_list(*fields, Value(True)), all=True)
+
+    windows, breaks = {}, {}
+    for barber_id, day_of_week, start_time, end_time, is_break in rows:
+        week = (breaks if is_break else windows).setdefault(barber_id, [[] for _ in WEEKDAYS])
+        interval = (start_time.hour * 60 + start_time.minute, end_time.hour * 60 + end_time.minute)
+        # A break without a weekday applies to every day
+        for index in [WEEKDAY_INDEX[day_of_week]] if day_of_week else range(len(WEEKDAYS)):
+            week[index].append(interval)
+
+    weeks = {}
+    for barber_id, week in windows.items():
+        week_breaks = breaks.get(barber_id, [[] for _ in WEEKDAYS])
+        weeks[barber_id] = tuple(
+            WorkingDay(tuple(sorted(day_windows)), tuple(sorted(day_breaks))) if day_windows else None
+            for day_windows, day_breaks in zip(week, week_breaks)
+        )
+    return weeks
+
+
+def get_weekly_schedules():
+    """``load_weekly_schedules``, cached until a schedule or break changes."""
+    return _get_cached(SCHEDULE_CACHE, [BarberSchedule, BarberBreak], load_weekly_schedules)
+
+
+def get_weekly_schedule(barber_id):
+    """The 7-entry week of one barber, see ``load_weekly_schedules``."""
+    return get_weekly_schedules().get(int(barber_id), DAYS_OFF)
+
+
+def _exception_dates(values):
+    """Parse the exceptions of a rule, skipping anything that is not a date in YYYY-MM-DD format."""
+    dates = set()
+    for value in values if isinstance(values, list) else ():
+        try:
+            dates.add(date.fromisoformat(str(value)))
+        except ValueError:
+            continue
+    return frozenset(dates)
+
+
+def load_time_off_rules():
+    """
+    Read the approved recurring time off of all barbers in one query.
+
+    Returns:
+        dict: A tuple of ``TimeOffRule`` for each barber ID that has any.
+    """
+    rules = {}
+    rows = RecurringTimeOff.objects.filter(isApproved=True).values_list(
+        'barber_id', 'frequency', 'start_date', 'until', 'exceptions', 'start_time', 'end_time')
+    for barber_id, frequency, start_date, until, exceptions, start_time, end_time in rows:
+        rules.setdefault(barber_id, []).append(TimeOffRule(
+            frequency, start_date, until, _exception_dates(exceptions),
+            (start_time.hour * 60 + start_time.minute, end_time.hour * 60 + end_time.minute),
+        ))
+    return {barber_id: tuple(barber_rules) for barber_id, barber_rules in rules.items()}
+
+
+def get_time_off_rules():
+    """``load_time_off_rules``, cached until a recurring time off changes."""
+    return _get_cached(TIME_OFF_RULES_CACHE, [RecurringTimeOff], load_time_off_rules)
+
+
+def last_time_off_date(barber_id, start_date, end_date):
+    """The last date from ``start_date`` to ``end_date`` with recurring time off of a barber, or None."""
+    rules = get_time_off_rules().get(int(barber_id), ())
+    return max((day for rule in rules for day in rule.occurrences(start_date, end_date)), default=None)
+
+
+def weekday_order(field='day_of_week'):
+    """Expression ordering rows by their weekday name from Monday to Sunday."""
+    return Case(*(When(**{field: day}, then=Value(index)) for day, index in WEEKDAY_INDEX.items()),
+                output_field=IntegerField())
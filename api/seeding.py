@@ -0,0 +1,174 @@
+"""
+Synthetic shop data for benchmarks and local reproduction of production volumes.
+
+Rows are generated deterministically from a seed and inserted with batched
+``bulk_create`` calls, so large shops can be built in seconds.
+"""
+import random
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from api import availability
+from api.models.enums import BookingStatus, ProvinceChoices, Weekday
+from api.models.models import Barber, BarberQualification, BarberSchedule, Booking, SelectedService, Service, \
+    TimeOffRequest, DailyBarberEarnings, UserExtra, add_minutes
+
+SERVICE_CATALOGUE = [
+    ('Haircut', 30.0, 30),
+    ('Beard Trim', 15.0, 15),
+    ('Hot Towel Shave', 25.0, 30),
+    ('Kids Haircut', 20.0, 30),
+    ('Haircut & Beard', 40.0, 45),
+    ('Hair Colouring', 60.0, 60),
+    ('Line Up', 10.0, 15),
+    ('Scalp Treatment', 35.0, 45),
+]
+
+STATUS_WEIGHTS = [
+    (BookingStatus.COMPLETED, 55),
+    (BookingStatus.CONFIRMED, 25),
+    (BookingStatus.PENDING, 10),
+    (BookingStatus.CANCELLED, 7),
+    (BookingStatus.NO_SHOW, 3),
+]
+
+POSITIONS = ['Junior Barber', 'Barber', 'Senior Barber', 'Master Barber']
+STREETS = ['Saint-Laurent', 'Sherbrooke', 'Saint-Denis', 'Mont-Royal', 'Notre-Dame', 'Ontario']
+
+
+def seed_shop(barbers=10, services=8, customers=200, days=90, bookings_per_day=8, time_off_rate=0.05,
+              start_date=None, seed=0, prefix='seed', batch_size=5000, stdout=None):
+    """
+    Generate a synthetic shop.
+
+    Args:
+        barbers (int): Number of barbers, each with a Monday to Saturday schedule.
+        services (int): Number of services, cycling through ``SERVICE_CATALOGUE``.
+        customers (int): Number of customer accounts, with their UserExtra, the bookings are spread over.
+        days (int): Number of days of bookings, starting at ``start_date``.
+        bookings_per_day (int): Bookings per barber and working day, at most 8.
+        time_off_rate (float): Probability that a barber takes an afternoon off on a working day.
+        start_date (datetime.date): First day of bookings, defaults to ``days`` days before today.
+        seed (int): Random seed, the same arguments always produce the same rows.
+        prefix (str): Prefix of the generated usernames, to seed several shops in one database.
+        batch_size (int): Number of rows per ``bulk_create`` call.
+        stdout: Optional stream progress is written to.
+
+    Returns:
+        dict: Number of rows created per model.
+    """
+    rng = random.Random(seed)
+    start_date = start_date or date.today() - timedelta(days=days)
+    bookings_per_day = min(bookings_per_day, 8)
+    counts = {}
+
+    with transaction.atomic():
+        barber_users = User.objects.bulk_create(
+            [User(username=f'{prefix}_barber_{i}', is_staff=True) for i in range(barbers)], batch_size=batch_size)
+        customer_users = User.objects.bulk_create(
+            [User(username=f'{prefix}_customer_{i}') for i in range(customers)], batch_size=batch_size)
+        user_extras = UserExtra.objects.bulk_create([
+            UserExtra(
+                user=user,
+                phone=f'+1514{rng.randrange(10 ** 7):07d}',
+                addressLine1=f'{rng.randrange(1, 9999)} Rue {rng.choice(STREETS)}',
+                province=ProvinceChoices.QUEBEC if rng.random() < 0.9 else rng.choice(ProvinceChoices.values),
+                postal_code=f'H{rng.randrange(10)}X{rng.randrange(10)}Y{rng.randrange(10)}',
+            ) for user in customer_users], batch_size=batch_size)
+        barber_rows = Barber.objects.bulk_create([
+            Barber(
+                user=user,
+                agreedMargin=rng.choice([50, 55, 60, 65]),
+                position=rng.choice(POSITIONS),
+                socialInsuranceNumber=f'{rng.randrange(10 ** 9):09d}',
+            ) for user in barber_users], batch_size=batch_size)
+
+        catalogue = [SERVICE_CATALOGUE[i % len(SERVICE_CATALOGUE)] for i in range(services)]
+        service_rows = Service.objects.bulk_create(
+            [Service(name=name if i < len(SERVICE_CATALOGUE) else f'{name} {i}', price=price, duration=duration)
+             for i, (name, price, duration) in enumerate(catalogue)], batch_size=batch_size)
+
+        qualifications = []
+        for barber in barber_rows:
+            for service in rng.sample(service_rows, max(1, len(service_rows) * 3 // 4)):
+                qualifications.append(BarberQualification(user=barber, service=service))
+        BarberQualification.objects.bulk_create(qualifications, batch_size=batch_size)
+
+        working_days = [day for day in Weekday.values if day != Weekday.SUNDAY]
+        BarberSchedule.objects.bulk_create(
+            [BarberSchedule(barber=barber, day_of_week=day, start_time=time(9, 0), end_time=time(17, 0))
+             for barber in barber_rows for day in working_days], batch_size=batch_size)
+
+        counts.update({
+            'users': len(barber_users) + len(customer_users),
+            'user_extras': len(user_extras),
+            'barbers': len(barber_rows),
+            'services': len(service_rows),
+            'qualifications': len(qualifications),
+            'schedules': len(barber_rows) * len(working_days),
+            'bookings': 0,
+            'selected_services': 0,
+            'time_off_requests': 0,
+        })
+
+        qualified = {barber.id: [] for barber in barber_rows}
+        for qualification in qualifications:
+            qualified[qualification.user_id].append(qualification.service)
+        # Foreign keys are set by ID, assigning instances costs more than building the rows
+        customer_ids = [user.id for user in customer_users]
+        statuses = [status for status, _ in STATUS_WEIGHTS]
+        weights = [weight for _, weight in STATUS_WEIGHTS]
+
+        bookings, booking_services, time_offs = [], [], []
+
+        def flush():
+            Booking.objects.bulk_create(bookings, batch_size=batch_size)
+            selected = [SelectedService(appointment_id=booking.id, service_id=service.id)
+                        for booking, services_ in zip(bookings, booking_services) for service in services_]
+            SelectedService.objects.bulk_create(selected, batch_size=batch_size)
+            TimeOffRequest.objects.bulk_create(time_offs, batch_size=batch_size)
+            counts['bookings'] += len(bookings)
+            counts['selected_services'] += len(selected)
+            counts['time_off_requests'] += len(time_offs)
+            bookings.clear()
+            booking_services.clear()
+            time_offs.clear()
+            if stdout:
+                stdout.write(f"  {counts['bookings']} bookings")
+
+        for offset in range(days):
+            booking_date = start_date + timedelta(days=offset)
+            if booking_date.weekday() == 6:
+                continue
+            for barber in barber_rows:
+                # One booking per hour keeps bookings of up to 60 minutes from overlapping
+                hours = sorted(rng.sample(range(9, 17), bookings_per_day))
+                day_off = rng.random() < time_off_rate
+                if day_off:
+                    hours = [hour for hour in hours if hour < 13]
+                    time_offs.append(TimeOffRequest(
+                        barber_id=barber.id, date=booking_date, start_time=time(13, 0), end_time=time(17, 0),
+                        reason='Synthetic time off', isApproved=rng.random() < 0.9))
+                for hour in hours:
+                    picks = rng.sample(qualified[barber.id], min(len(qualified[barber.id]), rng.choice([1, 1, 2])))
+                    # Keep every booking within its hour
+                    while sum(service.duration for service in picks) > 60 and len(picks) > 1:
+                        picks.pop()
+                    duration = sum(service.duration for service in picks)
+                    minute = rng.choice([0, 0, 15]) if duration <= 45 else 0
+                    start_time = time(hour, minute)
+                    bookings.append(Booking(
+                        barber_id=barber.id, user_id=rng.choice(customer_ids), booking_date=booking_date,
+                        start_time=start_time, status=rng.choices(statuses, weights)[0],
+                        duration_minutes=duration, end_time=add_minutes(start_time, duration)))
+                    booking_services.append(picks)
+            if len(bookings) >= batch_size:
+                flush()
+        flush()
+
+    # bulk_create does not send the signals that invalidate cached availability and refresh the rollups
+    availability.invalidate_all()
+    DailyBarberEarnings.rebuild(start_date, start_date + timedelta(days=days))
+    return counts
@@ -1,5 +1,8 @@
 from time import process_time_ns
 
+from django.core.files.storage import default_storage
+from django.utils.encoding import filepath_to_uri
+from django.utils.functional import cached_property
 from rest_framework import serializers
 # from api.models import Service
 from api.models.models import Service, Barber, BarberQualification, BarberSchedule, Booking, SelectedService
@@ -9,27 +12,63 @@ class ServiceSerializer(serializers.ModelSerializer):
         model = Service
         fields = '__all__'
 
+class MediaURLField(serializers.Field):
+    """
+    Absolute URL of a file field. The media URL is resolved against the request once per
+    serializer instead of once per row.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    @cached_property
+    def base_url(self):
+        request = self.context.get('request')
+        url = default_storage.base_url
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return self.base_url + filepath_to_uri(value.name)
+
+
+class SrcsetField(MediaURLField):
+    """``srcset`` attribute per image format, from file names keyed by format and width."""
+    def to_representation(self, value):
+        return {
+            image_format: ', '.join(
+                f'{self.base_url}{filepath_to_uri(name)} {width}w'
+                for width, name in sorted(widths.items(), key=lambda item: int(item[0]))
+            )
+            for image_format, widths in value.items() if widths
+        }
+
+
 class BarberSerializer(serializers.ModelSerializer):
-    name = serializers.SerializerMethodField(read_only=True)
-    profile_image = serializers.SerializerMethodField(read_only=True)
+    name = serializers.CharField(source='user.username', read_only=True)
+    profile_image = MediaURLField(source='profileImage')
+    profile_image_srcset = SrcsetField(source='profileThumbnails')
 
     class Meta:
         model = Barber
-        fields = ['id', 'name', 'profile_image', 'position']
-
-    def get_name(self, obj):
-        return f"{obj.user.username}"
-
-    def get_profile_image(self, obj):
-        request = self.context.get('request')
-        try:
-            data = request.build_absolute_uri(obj.profileImage.url)
-        except Exception as e:
-            data = None
-        return data
+        fields = ['id', 'name', 'profile_image', 'profile_image_srcset', 'position']
 
 
 class BarberScheduleSerializer(serializers.ModelSerializer):
     class Meta:
         model = BarberSchedule
         fields = '__all__'
+
+
+class BookingCreateSerializer(serializers.Serializer):
+    barber_id = serializers.IntegerField()
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    service_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
+class BookingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Booking
+        fields = ['id', 'barber', 'booking_date', 'start_time', 'status']
@@ -0,0 +1,259 @@
+"""
+Model signal receivers that keep cached and denormalized data consistent with the database.
+"""
+import datetime
+import logging
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from api import availability, catalogue
+from api.thumbnails import delete_thumbnails, generate_thumbnails, thumbnail_paths
+from api.models.models import Barber, BarberBreak, BarberSchedule, Booking, CachedModel, DailyBarberEarnings, \
+    RecurringTimeOff, SelectedService, Service, TimeOffRequest
+
+logger = logging.getLogger(__name__)
+
+
+def _invalidate(func, *args):
+    """
+    Invalidate now and again once the transaction commits, so that a concurrent read
+    cannot cache the state from before the commit under the new version.
+    """
+    func(*args)
+    transaction.on_commit(lambda: func(*args))
+
+
+# Booking days refreshed by the delete() call whose signals this thread is sending
+_deletion = threading.local()
+
+
+def _deleted_with_booking(origin):
+    """
+    Whether the ``delete()`` call that started at ``origin`` removes the bookings of the
+    selected services it deletes too. Selected services only outlive their booking when
+    they or their service are deleted, otherwise the booking's own receivers do the work.
+    """
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return not issubclass(model, (SelectedService, Service))
+
+
+def _remember_previous(sender, instance, fields):
+    """Store the values ``fields`` had in the database before this save, if the row exists."""
+    instance._previous = None
+    if instance.pk is not None:
+        instance._previous = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(pre_save, sender=Booking)
+def booking_pre_save(sender, instance, **kwargs):
+    _remember_previous(sender, instance, ['barber_id', 'booking_date'])
+
+
+@receiver(pre_save, sender=Service)
+def service_pre_save(sender, instance, **kwargs):
+    _remember_previous(sender, instance, ['duration', 'price'])
+
+
+@receiver(pre_save, sender=Barber)
+def barber_pre_save(sender, instance, **kwargs):
+    _remember_previous(sender, instance, ['agreedMargin', 'profileImage'])
+
+
+@receiver(pre_save, sender=TimeOffRequest)
+def time_off_pre_save(sender, instance, **kwargs):
+    _remember_previous(sender, instance, ['barber_id', 'date'])
+
+
+@receiver(pre_save, sender=RecurringTimeOff)
+def recurring_time_off_pre_save(sender, instance, **kwargs):
+    _remember_previous(sender, instance, ['barber_id'])
+
+
+@receiver(post_save, sender=SelectedService)
+@receiver(post_delete, sender=SelectedService)
+def sync_booking_duration(sender, instance, origin=None, **kwargs):
+    if _deleted_with_booking(origin):
+        return
+    try:
+        appointment = instance.appointment
+    except Booking.DoesNotExist:
+        return
+    appointment.sync_duration()
+
+
+@receiver(post_save, sender=Service)
+def sync_service_bookings_duration(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if created or not previous or previous[0] == instance.duration:
+        return
+    # Past bookings keep the duration they took place with
+    Booking.objects.filter(
+        booking_date__gte=datetime.date.today(),
+        pk__in=SelectedService.objects.filter(service=instance).values('appointment'),
+    ).sync_durations()
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_booking_availability(sender, instance, **kwargs):
+    _invalidate(availability.invalidate_day, instance.barber_id, instance.booking_date)
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        _invalidate(availability.invalidate_day, previous[0], previous[1])
+
+
+@receiver(post_save, sender=TimeOffRequest)
+@receiver(post_delete, sender=TimeOffRequest)
+def invalidate_time_off_availability(sender, instance, **kwargs):
+    _invalidate(availability.invalidate_day, instance.barber_id, instance.date)
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        _invalidate(availability.invalidate_day, previous[0], previous[1])
+
+
+@receiver(post_save, sender=SelectedService)
+@receiver(post_delete, sender=SelectedService)
+def invalidate_selected_service_availability(sender, instance, origin=None, **kwargs):
+    # A booking deleted along with its services is invalidated itself
+    if _deleted_with_booking(origin):
+        return
+    try:
+        appointment = instance.appointment
+    except Booking.DoesNotExist:
+        return
+    _invalidate(availability.invalidate_day, appointment.barber_id, appointment.booking_date)
+
+
+@receiver(post_save, sender=BarberSchedule)
+@receiver(post_delete, sender=BarberSchedule)
+@receiver(post_save, sender=BarberBreak)
+@receiver(post_delete, sender=BarberBreak)
+def invalidate_schedule_availability(sender, instance, **kwargs):
+    _invalidate(availability.invalidate_barber, instance.barber_id)
+
+
+@receiver(post_save, sender=RecurringTimeOff)
+@receiver(post_delete, sender=RecurringTimeOff)
+def invalidate_recurring_time_off_availability(sender, instance, **kwargs):
+    # Occurrences may fall on any date, so every day of the barber is dropped
+    _invalidate(availability.invalidate_barber, instance.barber_id)
+    previous = getattr(instance, '_previous', None)
+    if previous and previous[0] != instance.barber_id:
+        _invalidate(availability.invalidate_barber, previous[0])
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_availability(sender, instance, **kwargs):
+    _invalidate(availability.invalidate_all)
+
+
+@receiver(pre_delete, sender=Booking)
+def booking_pre_delete(sender, instance, origin=None, **kwargs):
+    # Every pre_delete of a delete() call is sent before its first post_delete, so a
+    # post_delete already sent means that a new call started, even from the same origin
+    if getattr(_deletion, 'origin', None) is not origin or _deletion.sent:
+        _deletion.origin, _deletion.sent, _deletion.refreshed = origin, False, set()
+
+
+@receiver(post_delete, sender=Booking)
+def refresh_deleted_booking_earnings(sender, instance, origin=None, **kwargs):
+    # Deleting many bookings at once, e.g. with their barber, refreshes each day once
+    _deletion.sent = True
+    day = (instance.barber_id, instance.booking_date)
+    if day not in _deletion.refreshed:
+        _deletion.refreshed.add(day)
+        DailyBarberEarnings.refresh(*day)
+
+
+@receiver(post_save, sender=Booking)
+def refresh_booking_earnings(sender, instance, **kwargs):
+    DailyBarberEarnings.refresh(instance.barber_id, instance.booking_date)
+    previous = getattr(instance, '_previous', None)
+    if previous and tuple(previous) != (instance.barber_id, instance.booking_date):
+        DailyBarberEarnings.refresh(previous[0], previous[1])
+
+
+@receiver(post_save, sender=SelectedService)
+@receiver(post_delete, sender=SelectedService)
+def refresh_selected_service_earnings(sender, instance, origin=None, **kwargs):
+    if _deleted_with_booking(origin):
+        return
+    try:
+        appointment = instance.appointment
+    except Booking.DoesNotExist:
+        return
+    DailyBarberEarnings.refresh(appointment.barber_id, appointment.booking_date)
+
+
+@receiver(post_save, sender=Service)
+def refresh_service_earnings(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if created or not previous or previous[1] == instance.price:
+        return
+    days = Booking.objects.filter(selectedservice__service=instance).values_list('barber_id', 'booking_date')
+    for barber_id, date in days.distinct().order_by():
+        DailyBarberEarnings.refresh(barber_id, date)
+
+
+@receiver(post_save, sender=Barber)
+def refresh_barber_earnings(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if created or not previous or previous[0] == instance.agreedMargin:
+        return
+    DailyBarberEarnings.rebuild(datetime.date.min, datetime.date.max, barber_ids=[instance.id])
+
+
+@receiver(post_save, sender=Barber)
+def generate_profile_thumbnails(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    image = instance.profileImage
+    if (previous[1] if previous else None) == (image.name or None):
+        return
+    try:
+        thumbnails = generate_thumbnails(image) if image else {}
+    except OSError:
+        # Covers PIL.UnidentifiedImageError too, which subclasses OSError. The upload is
+        # kept and the pages fall back to the original image.
+        logger.exception('Could not generate the thumbnails of %s', image.name)
+        thumbnails = {}
+    if thumbnails == instance.profileThumbnails:
+        return
+
+    replaced = thumbnail_paths(instance.profileThumbnails) - thumbnail_paths(thumbnails)
+    instance.profileThumbnails = thumbnails
+    sender.objects.filter(pk=instance.pk).update(profileThumbnails=thumbnails)
+    if replaced:
+        # Identical uploads share their thumbnails, keep the files other barbers still use
+        others = sender.objects.exclude(pk=instance.pk).exclude(profileThumbnails={}).values_list(
+            'profileThumbnails', flat=True)
+        in_use = {path for other in others for path in thumbnail_paths(other)}
+        transaction.on_commit(lambda: delete_thumbnails(replaced - in_use))
+
+
+def invalidate_cached_model(sender, **kwargs):
+    _invalidate(sender.invalidate_cache)
+
+
+# Connected to each cached model rather than to the saves of every model in the project
+for model in apps.get_models():
+    if issubclass(model, CachedModel):
+        post_save.connect(invalidate_cached_model, sender=model)
+        post_delete.connect(invalidate_cached_model, sender=model)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_catalogue_users(sender, update_fields=None, **kwargs):
+    # Barber names come from their users. Logging in only touches last_login, which no catalogue response shows
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    _invalidate(catalogue.invalidate_table, sender)
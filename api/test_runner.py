@@ -0,0 +1,16 @@
+from django.test.runner import DiscoverRunner
+
+from api.cache_backends import isolated_caches
+
+
+class TestRunner(DiscoverRunner):
+    """Test runner that gives the tests their own caches, see ``isolated_caches``."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_caches = isolated_caches()
+        self._isolated_caches.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_caches.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,714 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles import finders
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api import reports
+from api.availability import MINUTES_PER_DAY, DayAvailability
+from api.cache import get_stats
+from api.management.commands.benchmark_startup import HEAVY_MODULES, SCENARIOS, Command as StartupBenchmark
+from api.models.enums import BookingStatus, Recurrence
+from api.models.models import Barber, BarberBreak, BarberQualification, BarberSchedule, Booking, DailyBarberEarnings, \
+    RecurringTimeOff, SelectedService, Service, TimeOffRequest, UserExtra
+from api.schedules import DAYS_OFF, TimeOffRule, WorkingDay, get_weekly_schedule, get_weekly_schedules
+from api.seeding import seed_shop
+from api.thumbnails import THUMBNAIL_DIR, thumbnail_paths
+from api.views import get_any_barber_time_slots, get_availability_calendar, get_time_slots
+
+
+class AvailabilityQueryCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.barber = Barber.objects.create(user=User.objects.create(username='barber', is_staff=True))
+        self.client_user = User.objects.create(username='client')
+        self.date = date.today() + timedelta(days=7)
+        BarberSchedule.objects.create(
+            barber=self.barber, day_of_week=self.date.strftime('%A'), start_time=time(8, 0), end_time=time(20, 0)
+        )
+        self.cut = Service.objects.create(name='Cut', price=30, duration=30)
+        self.beard = Service.objects.create(name='Beard', price=15, duration=15)
+
+    def book(self, hours, booking_date=None):
+        for hour in hours:
+            booking = Booking.objects.create(
+                barber=self.barber, user=self.client_user, booking_date=booking_date or self.date,
+                start_time=time(hour, 0)
+            )
+            SelectedService.objects.create(appointment=booking, service=self.cut)
+            SelectedService.objects.create(appointment=booking, service=self.beard)
+
+    def test_query_count_does_not_grow_with_bookings(self):
+        self.book([8])
+        with self.assertNumQueries(5):
+            get_time_slots(self.barber.id, self.date, self.cut.id)
+
+        # The schedule and time-off rule maps stay cached, only the service, bookings and time-off are read again
+        self.book(range(9, 20))
+        with self.assertNumQueries(3):
+            slots = get_time_slots(self.barber.id, self.date, self.cut.id)
+
+        # Each hour is blocked for 45 minutes, leaving only the :45 slot free for a 15 minute service
+        self.assertEqual(get_time_slots(self.barber.id, self.date, self.beard.id), [time(8 + i, 45) for i in range(12)])
+        self.assertEqual(slots, [])
+
+    def test_denormalized_duration_follows_selected_services(self):
+        self.book([8])
+        booking = Booking.objects.get()
+        self.book([8], date.today() - timedelta(days=7))
+        past_booking = Booking.objects.exclude(pk=booking.pk).get()
+        self.assertEqual((booking.duration_minutes, booking.end_time), (45, time(8, 45)))
+
+        SelectedService.objects.filter(service=self.beard).delete()
+        booking.refresh_from_db()
+        self.assertEqual((booking.duration_minutes, booking.end_time), (30, time(8, 30)))
+
+        self.cut.duration = 60
+        self.cut.save()
+        booking.refresh_from_db()
+        self.assertEqual((booking.duration_minutes, booking.end_time), (60, time(9, 0)))
+        # Bookings that already took place keep their duration
+        past_booking.refresh_from_db()
+        self.assertEqual((past_booking.duration_minutes, past_booking.end_time), (30, time(8, 30)))
+
+        booking.start_time = time(10, 0)
+        booking.save(update_fields=['start_time'])
+        booking.refresh_from_db()
+        self.assertEqual(booking.end_time, time(11, 0))
+
+    def test_total_duration_annotation(self):
+        self.book([8, 10])
+        durations = Booking.objects.with_total_duration().values_list('total_duration', flat=True)
+        self.assertEqual(list(durations), [45, 45])
+
+    def test_invalid_parameters_are_rejected(self):
+        response = self.client.get('/api/availability-calendar', {'barber_id': 'abc', 'service_id': self.cut.id})
+        self.assertEqual(response.status_code, 400)
+        for path in ('/api/available-time-slots', '/api/async/available-time-slots'):
+            response = self.client.get(path, {'barber_id': self.barber.id, 'service_id': 'abc', 'date': self.date})
+            self.assertEqual(response.status_code, 400)
+
+    def test_calendar_query_count_does_not_grow_with_booked_days(self):
+        start_date = self.date - timedelta(days=6)
+        end_date = self.date + timedelta(days=21)
+        with self.assertNumQueries(5):
+            get_availability_calendar(self.barber.id, self.cut.id, start_date, end_date)
+
+        for week in range(4):
+            self.book(range(8, 20), start_date + timedelta(days=6 + 7 * week))
+        with self.assertNumQueries(3):
+            calendar = get_availability_calendar(self.barber.id, self.cut.id, start_date, end_date)
+
+        working = [day for day in calendar if day['working']]
+        self.assertEqual([day['date'] for day in working], [self.date + timedelta(days=7 * week) for week in range(4)])
+        self.assertTrue(all(day['blocked'] and day['slots'] == 0 for day in working))
+        self.assertEqual(len(calendar), 28)
+
+    def test_cached_slots_are_invalidated_by_signals(self):
+        self.book([8])
+        slots = get_time_slots(self.barber.id, self.date, self.cut.id)
+
+        # Only the service lookup hits the database once the day is cached
+        with self.assertNumQueries(1):
+            self.assertEqual(get_time_slots(self.barber.id, self.date, self.cut.id), slots)
+        self.assertEqual(get_stats('availability')['hits'], 1)
+
+        TimeOffRequest.objects.create(
+            barber=self.barber, date=self.date, start_time=time(9, 0), end_time=time(20, 0), isApproved=True
+        )
+        self.assertEqual(get_time_slots(self.barber.id, self.date, self.cut.id), [])
+
+        booking = Booking.objects.get()
+        booking.booking_date = self.date + timedelta(days=7)
+        booking.save()
+        TimeOffRequest.objects.all().delete()
+        self.assertEqual(get_time_slots(self.barber.id, self.date, self.cut.id)[0], time(8, 0))
+
+        BarberSchedule.objects.update(start_time=time(10, 0))
+        BarberSchedule.objects.get().save()
+        self.assertEqual(get_time_slots(self.barber.id, self.date, self.cut.id)[0], time(10, 0))
+
+    def test_weekly_schedules_are_kept_until_a_schedule_changes(self):
+        weekday = self.date.weekday()
+        week = get_weekly_schedule(self.barber.id)
+        self.assertEqual(week[weekday], WorkingDay(((8 * 60, 20 * 60),)))
+        self.assertEqual(week.count(None), 6)
+        with self.assertNumQueries(0):
+            self.assertIs(get_weekly_schedules()[self.barber.id], week)
+
+        schedule = BarberSchedule.objects.get()
+        schedule.end_time = time(12, 0)
+        schedule.save()
+        self.assertEqual(get_weekly_schedule(self.barber.id)[weekday].windows, ((8 * 60, 12 * 60),))
+        schedule.delete()
+        self.assertEqual(get_weekly_schedule(self.barber.id), DAYS_OFF)
+
+    def test_split_shifts_and_breaks(self):
+        day_of_week = self.date.strftime('%A')
+        BarberSchedule.objects.update(end_time=time(12, 0))
+        BarberSchedule.objects.create(
+            barber=self.barber, day_of_week=day_of_week, start_time=time(14, 0), end_time=time(17, 0))
+        BarberBreak.objects.create(barber=self.barber, start_time=time(9, 0), end_time=time(9, 30))
+        BarberBreak.objects.create(
+            barber=self.barber, day_of_week=day_of_week, start_time=time(15, 0), end_time=time(15, 15))
+        self.book([10])
+
+        # The windows, breaks and booking are merged into one set of busy intervals
+        with self.assertNumQueries(5):
+            slots = get_time_slots(self.barber.id, self.date, self.cut.id)
+        self.assertEqual(slots, [
+            time(8, 0), time(8, 15), time(8, 30), time(9, 30), time(10, 45), time(11, 0), time(11, 15), time(11, 30),
+            time(14, 0), time(14, 15), time(14, 30), time(15, 15), time(15, 30), time(15, 45), time(16, 0),
+            time(16, 15), time(16, 30),
+        ])
+
+        # A break on another weekday does not apply to this date
+        weekday_break = BarberBreak.objects.get(day_of_week=day_of_week)
+        weekday_break.day_of_week = (self.date + timedelta(days=1)).strftime('%A')
+        weekday_break.save()
+        self.assertIn(time(15, 0), get_time_slots(self.barber.id, self.date, self.cut.id))
+
+    def test_any_barber_slots_are_computed_in_one_pass(self):
+        BarberQualification.objects.create(user=self.barber, service=self.cut)
+        self.book(range(8, 20))
+        barber_ids = []
+        for i in range(5):
+            barber = Barber.objects.create(user=User.objects.create(username=f'barber{i}', is_staff=True))
+            BarberQualification.objects.create(user=barber, service=self.cut)
+            BarberSchedule.objects.create(
+                barber=barber, day_of_week=self.date.strftime('%A'), start_time=time(9 + i, 0), end_time=time(18, 0)
+            )
+            barber_ids.append(barber.id)
+
+        with self.assertNumQueries(6):
+            slots = get_any_barber_time_slots(self.cut.id, self.date)
+
+        self.assertEqual(slots[0], {'time': time(9, 0), 'barbers': barber_ids[:1]})
+        self.assertEqual(slots[-1], {'time': time(17, 30), 'barbers': barber_ids})
+
+    def test_slots_for_combined_services(self):
+        self.book(range(8, 20, 2))
+        with self.assertNumQueries(5):
+            slots = get_time_slots(self.barber.id, self.date, [self.cut.id, self.beard.id])
+
+        # Bookings take 45 minutes every other hour, leaving 75 minute gaps for a 45 minute combo
+        self.assertEqual(slots[:3], [time(8, 45), time(9, 0), time(9, 15)])
+        self.assertEqual(get_time_slots(self.barber.id, self.date, [self.cut.id, 0]), [])
+
+    def test_recurring_time_off_is_expanded_over_the_requested_dates(self):
+        RecurringTimeOff.objects.create(
+            barber=self.barber, frequency=Recurrence.BIWEEKLY, start_date=self.date, start_time=time(8, 0),
+            end_time=time(20, 0), exceptions=[(self.date + timedelta(days=14)).isoformat()], isApproved=True,
+        )
+        end_date = self.date + timedelta(days=42)
+        with self.assertNumQueries(5):
+            calendar = get_availability_calendar(self.barber.id, self.cut.id, self.date, end_date)
+        blocked = [day['date'] for day in calendar if day['working'] and day['blocked']]
+        expected = [self.date + timedelta(days=days) for days in (0, 28, 42)]
+        self.assertEqual(blocked, expected)
+
+        response = APIClient().get('/api/blocked-dates', {'barber_id': self.barber.id, 'service_id': self.cut.id})
+        self.assertEqual(response.json()[:3], [day.isoformat() for day in expected])
+
+        # Rules that are not approved do not apply
+        RecurringTimeOff.objects.update(isApproved=False)
+        RecurringTimeOff.objects.get().save()
+        self.assertNotEqual(get_time_slots(self.barber.id, self.date, self.cut.id), [])
+
+    def test_recurring_time_off_exceptions_are_validated(self):
+        with self.assertRaises(ValidationError):
+            RecurringTimeOff.objects.create(barber=self.barber, start_date=self.date, exceptions=['next friday'])
+        rule = RecurringTimeOff.objects.create(
+            barber=self.barber, start_date=self.date, isApproved=True,
+            exceptions=[(self.date + timedelta(days=7)).isoformat(), self.date])
+        self.assertEqual(rule.exceptions, [self.date.isoformat(), (self.date + timedelta(days=7)).isoformat()])
+
+        # Rows changed without saving still load, skipping what cannot be parsed
+        RecurringTimeOff.objects.update(exceptions=['next friday', 5, (self.date + timedelta(days=7)).isoformat()])
+        RecurringTimeOff.invalidate_cache()
+        self.assertEqual(get_time_slots(self.barber.id, self.date + timedelta(days=7), self.cut.id)[0], time(8, 0))
+        self.assertEqual(get_time_slots(self.barber.id, self.date + timedelta(days=14), self.cut.id), [])
+
+
+class DayAvailabilityTest(SimpleTestCase):
+    def test_slots_stay_on_the_grid_of_the_window(self):
+        # A booking ending at 10:20 frees the slots from 10:30, not from 10:20
+        day = DayAvailability(9 * 60, 12 * 60, [(10 * 60, 10 * 60 + 20)])
+        self.assertEqual(list(day.iter_slots(30)), [540, 555, 570, 630, 645, 660, 675, 690])
+        self.assertEqual(list(DayAvailability(545, 640).iter_slots(30)), [545, 560, 575, 590, 605])
+        self.assertFalse(day.is_slot(620, 30))
+        self.assertTrue(day.is_slot(630, 30))
+
+    def test_not_before(self):
+        day = DayAvailability(9 * 60, 12 * 60)
+        self.assertEqual(list(day.iter_slots(60, not_before=600)), [615, 630, 645, 660])
+        self.assertEqual(list(day.iter_slots(60, not_before=599))[0], 600)
+        self.assertEqual(list(day.iter_slots(60, not_before=MINUTES_PER_DAY)), [])
+        self.assertFalse(day.is_slot(600, 60, not_before=600))
+        self.assertTrue(day.is_slot(615, 60, not_before=600))
+
+    def test_busy_intervals_crossing_the_window_edges(self):
+        day = DayAvailability(9 * 60, 12 * 60, [(500, 570), (700, 800)])
+        self.assertEqual(list(day.iter_slots(30)), list(range(570, 661, 15)))
+        self.assertFalse(day.is_free(555, 30))
+        self.assertTrue(day.is_free(660, 30))
+        self.assertFalse(day.is_free(675, 30))
+
+        # A split shift from 9:00 to 12:00 and 13:00 to 15:00, with a booking across the gap
+        day = DayAvailability.from_windows([(780, 900), (540, 720)], [(700, 800)])
+        self.assertEqual(list(day.iter_slots(30)), list(range(540, 661, 15)) + list(range(810, 871, 15)))
+        self.assertFalse(day.is_free(690, 30))
+
+    def test_duration_longer_than_the_window(self):
+        self.assertEqual(list(DayAvailability(540, 600).iter_slots(90)), [])
+        self.assertFalse(DayAvailability(540, 600).is_free(540, 90))
+        # Slots never span the gap between two windows
+        day = DayAvailability.from_windows([(540, 600), (660, 720)])
+        self.assertEqual(list(day.iter_slots(90)), [])
+        self.assertEqual(list(day.iter_slots(60)), [540, 660])
+        self.assertEqual(list(DayAvailability.from_windows([]).iter_slots(15)), [])
+
+
+class TimeOffRuleTest(SimpleTestCase):
+    def test_occurrences(self):
+        biweekly = TimeOffRule(Recurrence.BIWEEKLY, date(2026, 1, 2), date(2026, 3, 31),
+                               frozenset([date(2026, 1, 30)]), (0, 60))
+        self.assertEqual(list(biweekly.occurrences(date(2026, 1, 10), date(2026, 12, 31))),
+                         [date(2026, 1, 16), date(2026, 2, 13), date(2026, 2, 27), date(2026, 3, 13),
+                          date(2026, 3, 27)])
+
+        # Expanding a window far from the first occurrence does not walk the dates in between
+        weekly = TimeOffRule(Recurrence.WEEKLY, date(2000, 1, 3), None, frozenset(), (0, 60))
+        self.assertEqual(list(weekly.occurrences(date(2026, 1, 1), date(2026, 1, 12))),
+                         [date(2026, 1, 5), date(2026, 1, 12)])
+
+        # Months without the 31st are skipped
+        monthly = TimeOffRule(Recurrence.MONTHLY, date(2026, 1, 31), None, frozenset(), (0, 60))
+        self.assertEqual(list(monthly.occurrences(date(2026, 1, 1), date(2026, 5, 31))),
+                         [date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)])
+
+
+class CreateBookingTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.barber = Barber.objects.create(user=User.objects.create(username='barber', is_staff=True))
+        self.date = date.today() + timedelta(days=7)
+        BarberSchedule.objects.create(
+            barber=self.barber, day_of_week=self.date.strftime('%A'), start_time=time(9, 0), end_time=time(12, 0)
+        )
+        self.cut = Service.objects.create(name='Cut', price=30, duration=30)
+        self.beard = Service.objects.create(name='Beard', price=15, duration=15)
+        BarberQualification.objects.create(user=self.barber, service=self.cut)
+        BarberQualification.objects.create(user=self.barber, service=self.beard)
+
+    def post(self, username, start_time, service_ids):
+        client = APIClient()
+        client.force_authenticate(User.objects.get_or_create(username=username)[0])
+        return client.post('/api/bookings', {
+            'barber_id': self.barber.id, 'date': self.date.isoformat(), 'start_time': start_time,
+            'service_ids': service_ids,
+        }, format='json')
+
+    def test_create_booking(self):
+        response = self.post('client', '09:00', [self.cut.id, self.beard.id])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(response.data['services']), [self.cut.id, self.beard.id])
+        self.assertEqual(get_time_slots(self.barber.id, self.date, self.beard.id)[0], time(9, 45))
+
+        self.assertEqual(self.post('other', '09:30', [self.beard.id]).status_code, 409)
+        self.assertEqual(self.post('other', '09:50', [self.beard.id]).status_code, 409)
+        self.assertEqual(self.post('other', '11:45', [self.cut.id]).status_code, 409)
+        self.assertEqual(self.post('other', '09:45', [self.cut.id]).status_code, 201)
+
+    def test_concurrent_creations_never_double_book(self):
+        statuses = []
+        barrier = threading.Barrier(12)
+        for index in range(12):
+            User.objects.create(username=f'client{index}')
+
+        def book(index):
+            try:
+                barrier.wait()
+                # Every request overlaps at least one other one
+                start_time = ['09:00', '09:15', '09:30', '10:00', '10:15', '10:30'][index % 6]
+                statuses.append(self.post(f'client{index}', start_time, [self.cut.id]).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(index,)) for index in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(set(statuses) <= {201, 409, 503}, statuses)
+        self.assertEqual(statuses.count(201), Booking.objects.count())
+        intervals = sorted(
+            (booking.start_time.hour * 60 + booking.start_time.minute,) for booking in Booking.objects.all()
+        )
+        for (previous,), (current,) in zip(intervals, intervals[1:]):
+            self.assertGreaterEqual(current - previous, 30)
+        self.assertGreaterEqual(statuses.count(201), 1)
+
+
+class EarningsReportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.start_date = date(2026, 1, 1)
+        seed_shop(barbers=3, customers=10, days=14, start_date=self.start_date)
+        self.end_date = self.start_date + timedelta(days=13)
+
+    def test_database_aggregation_matches_pandas_fallback(self):
+        aggregated = list(Booking.objects.earnings_by_day(self.start_date, self.end_date))
+        fallback = reports.aggregate_earnings_rows(Barber.prepare_df_data(self.start_date, self.end_date))
+
+        self.assertEqual(len(aggregated), len(fallback))
+        for row, (_, expected) in zip(aggregated, fallback.iterrows()):
+            self.assertEqual(row['bookings'], expected['bookings'])
+            for column in ('gross', 'barberCut', 'shopCut'):
+                self.assertAlmostEqual(row[column], expected[column])
+
+    def test_deleting_bookings_refreshes_each_day_once(self):
+        def count_refreshes(obj):
+            with CaptureQueriesContext(connection) as context:
+                obj.delete()
+            return sum('AS "bookingDate"' in query['sql'] for query in context.captured_queries)
+
+        # The selected services deleted with a booking leave the refresh to the booking
+        self.assertEqual(count_refreshes(Booking.objects.first()), 1)
+
+        user = Booking.objects.first().user
+        days = set(user.booking_set.values_list('barber_id', 'booking_date'))
+        self.assertEqual(count_refreshes(user), len(days))
+        self.assertEqual(
+            DailyBarberEarnings.objects.count(),
+            len(Booking.objects.earnings_by_day(self.start_date, self.end_date)),
+        )
+
+    def test_rollup_follows_booking_changes(self):
+        self.assertEqual(
+            DailyBarberEarnings.objects.count(),
+            len(Booking.objects.earnings_by_day(self.start_date, self.end_date)),
+        )
+        booking = Booking.objects.filter(status=BookingStatus.PENDING).first()
+        rollup = DailyBarberEarnings.objects.get(barber=booking.barber, date=booking.booking_date)
+
+        booking.status = BookingStatus.CONFIRMED
+        booking.save()
+        updated = DailyBarberEarnings.objects.get(pk=rollup.pk)
+        self.assertEqual((updated.pending, updated.confirmed), (rollup.pending - 1, rollup.confirmed + 1))
+        self.assertGreater(updated.billable_gross, rollup.billable_gross)
+
+        SelectedService.objects.filter(appointment=booking).delete()
+        updated.refresh_from_db()
+        self.assertAlmostEqual(updated.billable_gross, rollup.billable_gross)
+        self.assertEqual(updated.bookings, rollup.bookings)
+
+        booking.delete()
+        updated.refresh_from_db()
+        self.assertEqual(updated.bookings, rollup.bookings - 1)
+
+
+class BarberChangelistQueryCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='admin'))
+        seed_shop(barbers=2, customers=5, days=3, start_date=date.today() - timedelta(days=1), prefix='small')
+
+    def count_changelist_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/admin/api/barber/')
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_query_count_does_not_grow_with_barbers(self):
+        queries = self.count_changelist_queries()
+        seed_shop(barbers=12, customers=5, days=3, start_date=date.today() - timedelta(days=1), prefix='large')
+        self.assertEqual(self.count_changelist_queries(), queries)
+
+    def test_today_columns(self):
+        barber = Barber.objects.first()
+        service = Service.objects.first()
+        for status in (BookingStatus.CONFIRMED, BookingStatus.COMPLETED, BookingStatus.CANCELLED):
+            booking = Booking.objects.create(
+                barber=barber, user=barber.user, booking_date=date.today(), start_time=time(20, 0), status=status
+            )
+            SelectedService.objects.create(appointment=booking, service=service)
+
+        today = DailyBarberEarnings.objects.get(barber=barber, date=date.today())
+        annotated = admin.site._registry[Barber].get_queryset(None).get(pk=barber.pk)
+        self.assertEqual(annotated.appointments_today, today.confirmed + today.completed)
+        self.assertAlmostEqual(annotated.expected_earnings_today, today.billable_gross)
+        self.assertGreaterEqual(annotated.appointments_today, 2)
+
+    def test_only_plotly_js_is_served_from_the_plotly_package(self):
+        self.assertTrue(finders.find('plotly/plotly.min.js').endswith('plotly.min.js'))
+        self.assertIsNone(finders.find('plotly/datasets/iris.csv.gz'))
+
+    def test_report_chart_is_fetched_separately_and_cached(self):
+        response = self.client.get('/admin/api/barber/')
+        self.assertContains(response, 'plotly/plotly.min.js')
+        self.assertLess(len(response.content), 100_000)
+
+        url = '/admin/api/barber/report-data/?start_date={}&end_date={}'.format(
+            date.today() - timedelta(days=1), date.today() + timedelta(days=1))
+        with CaptureQueriesContext(connection) as first:
+            figure = self.client.get(url).json()
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.get(url).json(), figure)
+        self.assertLess(len(second), len(first))
+
+        Booking.objects.filter(booking_date=date.today() - timedelta(days=1)).delete()
+        self.assertNotEqual(self.client.get(url).json(), figure)
+
+
+class CatalogueConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(name='Cut', price=30, duration=30)
+        self.barber = Barber.objects.create(user=User.objects.create(username='barber'))
+        BarberQualification.objects.create(user=self.barber, service=self.service)
+
+    def test_only_cached_models_bump_versions(self):
+        self.assertTrue(post_save.has_listeners(Service))
+        self.assertFalse(post_save.has_listeners(LogEntry))
+        self.assertFalse(post_delete.has_listeners(Session))
+
+    def test_services_not_modified(self):
+        response = self.client.get('/api/services')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age', response['Cache-Control'])
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/services', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(context), 0)
+
+        # The payload is served from the cache while the table is unchanged
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get('/api/services').status_code, 200)
+        self.assertEqual(len(context), 0)
+
+        self.service.price = 35
+        self.service.save()
+        response = self.client.get('/api/services', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['price'], 35)
+
+    def test_qualified_barbers_follow_their_tables(self):
+        url = f'/api/qualified-barbers?service_id={self.service.id}'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.barber.user.username = 'renamed'
+        self.barber.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'renamed')
+
+        BarberQualification.objects.all().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json(), [])
+
+        self.assertEqual(self.client.get('/api/qualified-barbers').status_code, 400)
+
+
+class QualifiedBarbersQueryCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(name='Cut', price=30, duration=30)
+        users = User.objects.bulk_create([User(username=f'barber_{i}') for i in range(120)])
+        barbers = Barber.objects.bulk_create([
+            Barber(user=user, profileImage=f'profile_images/barber {i}.jpg' if i % 2 else None)
+            for i, user in enumerate(users)
+        ])
+        BarberQualification.objects.bulk_create([BarberQualification(user=barber, service=self.service)
+                                                 for barber in barbers])
+
+    def test_one_query_for_all_barbers(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/qualified-barbers?service_id={self.service.id}')
+        self.assertEqual(len(context), 1)
+
+        barbers = response.json()
+        self.assertEqual(len(barbers), 120)
+        by_name = {barber['name']: barber for barber in barbers}
+        self.assertIsNone(by_name['barber_0']['profile_image'])
+        self.assertEqual(by_name['barber_1']['profile_image'], 'http://testserver/images/profile_images/barber%201.jpg')
+
+
+class ProfileThumbnailTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = self.settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, barber, color):
+        buffer = BytesIO()
+        Image.new('RGB', (300, 400), color).save(buffer, 'PNG')
+        barber.profileImage = SimpleUploadedFile('portrait.png', buffer.getvalue(), content_type='image/png')
+        barber.save()
+
+    def test_thumbnails_are_generated_on_upload(self):
+        barber = Barber.objects.create(user=User.objects.create(username='barber'))
+        self.assertEqual(barber.profileThumbnails, {})
+
+        self.upload(barber, 'red')
+        barber.refresh_from_db()
+        self.assertEqual(set(barber.profileThumbnails), {'webp', 'jpeg'})
+        # Nothing is upscaled beyond the 300px wide original
+        self.assertEqual(set(barber.profileThumbnails['webp']), {'64', '128', '256'})
+        with default_storage.open(barber.profileThumbnails['jpeg']['64']) as thumbnail:
+            self.assertEqual(Image.open(thumbnail).size, (64, 85))
+
+        first = barber.profileThumbnails
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(barber, 'blue')
+        barber.refresh_from_db()
+        self.assertNotEqual(barber.profileThumbnails['webp']['64'], first['webp']['64'])
+        # Replaced thumbnails are removed from storage
+        self.assertFalse(any(default_storage.exists(path) for path in thumbnail_paths(first)))
+
+        service = Service.objects.create(name='Cut', price=30, duration=30)
+        BarberQualification.objects.create(user=barber, service=service)
+        data = self.client.get(f'/api/qualified-barbers?service_id={service.id}').json()[0]
+        self.assertTrue(data['profile_image_srcset']['webp'].startswith('http://testserver/images/'))
+        self.assertTrue(data['profile_image_srcset']['jpeg'].endswith(' 256w'))
+
+    def test_unreadable_upload_is_kept_without_thumbnails(self):
+        barber = Barber.objects.create(user=User.objects.create(username='barber'))
+        self.upload(barber, 'red')
+        with self.captureOnCommitCallbacks(execute=True), self.assertLogs('api.signals', 'ERROR'):
+            barber.profileImage = SimpleUploadedFile('portrait.png', b'not an image', content_type='image/png')
+            barber.save()
+        barber.refresh_from_db()
+        self.assertTrue(barber.profileImage.name.endswith('.png'))
+        self.assertEqual(barber.profileThumbnails, {})
+        self.assertEqual(list(default_storage.listdir(THUMBNAIL_DIR)[1]), [])
+
+
+class SeedShopCommandTest(TestCase):
+    def test_seed_is_deterministic(self):
+        options = dict(barbers=2, customers=5, days=14, start_date=date(2026, 1, 1), stdout=StringIO())
+        call_command('seed_shop', prefix='first', **options)
+        call_command('seed_shop', prefix='second', **options)
+
+        self.assertEqual(UserExtra.objects.count(), 10)
+        first, second = (
+            list(Booking.objects.filter(user__username__startswith=prefix).order_by('id').values_list(
+                'booking_date', 'start_time', 'status', 'duration_minutes'))
+            for prefix in ('first', 'second')
+        )
+        self.assertTrue(first)
+        self.assertEqual(first, second)
+        self.assertEqual(DailyBarberEarnings.objects.filter(barber__user__username__startswith='first').count(),
+                         DailyBarberEarnings.objects.filter(barber__user__username__startswith='second').count())
+
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_shop(barbers=3, customers=10, days=21, start_date=date.today() - timedelta(days=7))
+        self.barber = Barber.objects.first()
+        self.service = self.barber.barberqualification_set.first().service
+
+    def assertSameResponse(self, path):
+        sync_response = self.client.get(f'/api/{path}')
+        cache.clear()
+        async_response = self.client.get(f'/api/async/{path}')
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), sync_response.json())
+        return async_response.json()
+
+    def test_async_views_match_sync_views(self):
+        self.assertSameResponse('services')
+        self.assertSameResponse(f'qualified-barbers?service_id={self.service.id}')
+        self.assertSameResponse('qualified-barbers')
+        self.assertSameResponse(f'blocked-dates?barber_id={self.barber.id}&service_id={self.service.id}')
+        self.assertSameResponse(f'blocked-dates?barber_id={self.barber.id}')
+        self.assertSameResponse(f'blocked-dates?barber_id={self.barber.id}&service_id=0')
+        for offset in range(7):
+            day = date.today() + timedelta(days=offset)
+            self.assertSameResponse(
+                f'available-time-slots?barber_id={self.barber.id}&service_id={self.service.id}&date={day}')
+        self.assertSameResponse(f'available-time-slots?barber_id={self.barber.id}')
+
+    def test_async_catalogue_conditional_get(self):
+        for path in ['services', f'qualified-barbers?service_id={self.service.id}']:
+            sync_response = self.client.get(f'/api/{path}')
+            response = self.client.get(f'/api/async/{path}')
+            self.assertEqual(response['ETag'], sync_response['ETag'])
+            self.assertEqual(response['Last-Modified'], sync_response['Last-Modified'])
+            response = self.client.get(f'/api/async/{path}', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_entries_are_shared_through_the_shared_tier(self):
+        cache.set('catalogue:key', 'value')
+        # A fresh worker process starts with an empty local tier
+        cache.clear_local()
+        self.assertEqual(caches['shared'].get('catalogue:key'), 'value')
+        self.assertEqual(cache.get_many(['catalogue:key', 'missing']), {'catalogue:key': 'value'})
+
+        # Another process replaced the entry, this process keeps its local copy until it expires
+        caches['shared'].set('catalogue:key', 'other')
+        self.assertEqual(cache.get('catalogue:key'), 'value')
+        cache.clear_local()
+        self.assertEqual(cache.get('catalogue:key'), 'other')
+
+    def test_counters_and_add(self):
+        self.assertTrue(cache.add('stats:test', 0))
+        self.assertFalse(cache.add('stats:test', 5))
+        self.assertEqual(cache.incr('stats:test', 3), 3)
+        self.assertEqual(cache.get('stats:test'), 3)
+        with self.assertRaises(ValueError):
+            cache.incr('stats:missing')
+
+        cache.set('expired', 'value', timeout=0)
+        self.assertIsNone(cache.get('expired'))
+        self.assertTrue(cache.add('expired', 'again'))
+        cache.delete('expired')
+        self.assertFalse(cache.has_key('expired'))
+
+    def test_tests_do_not_share_the_cache_of_the_app(self):
+        self.assertNotEqual(caches['shared']._path, str(settings.BASE_DIR / '.cache' / 'cache.sqlite3'))
+
+    def test_local_tier_is_bounded(self):
+        cache.set_many({f'key:{i}': i for i in range(6000)})
+        self.assertLessEqual(len(cache._entries), 5000)
+        self.assertEqual(cache.get('key:0'), 0)
+
+
+class StartupImportTest(SimpleTestCase):
+    def test_api_path_does_not_import_reporting_libraries(self):
+        _, timings = StartupBenchmark.run(SCENARIOS['API (URLconf)'])
+        loaded = {module.strip() for _, _, module in timings}
+        self.assertIn('api.views', loaded)
+        self.assertFalse(loaded & set(HEAVY_MODULES))
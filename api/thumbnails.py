@@ -0,0 +1,75 @@
+"""
+Resized copies of uploaded profile images, so that pages can pick the smallest image
+that fits instead of downloading the original upload.
+
+Thumbnail file names embed a hash of the original image, which makes them safe to
+cache forever and lets identical uploads share their files.
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+THUMBNAIL_WIDTHS = [64, 128, 256, 512]
+# Pillow format name and file extension per output format, in order of preference
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DIR = 'profile_images/thumbnails'
+
+
+def generate_thumbnails(field_file):
+    """
+    Write every thumbnail of an image to the default storage.
+
+    Widths larger than the image are skipped, except for the smallest one, images are never upscaled.
+
+    Args:
+        field_file (django.db.models.fields.files.FieldFile): The uploaded image.
+
+    Returns:
+        dict: Thumbnail file names keyed by format and then by width, as a string for JSON.
+    """
+    # Pillow imports numpy when it is installed, keep both out of processes that never see an upload
+    from PIL import Image, ImageOps
+
+    field_file.open('rb')
+    try:
+        content = field_file.read()
+    finally:
+        field_file.close()
+    digest = hashlib.sha256(content).hexdigest()[:16]
+
+    image = ImageOps.exif_transpose(Image.open(BytesIO(content)))
+    widths = [width for width in THUMBNAIL_WIDTHS if width <= image.width] or THUMBNAIL_WIDTHS[:1]
+
+    thumbnails = {name: {} for name in THUMBNAIL_FORMATS}
+    for width in widths:
+        resized = None
+        for name, (image_format, extension) in THUMBNAIL_FORMATS.items():
+            path = f'{THUMBNAIL_DIR}/{digest}_{width}.{extension}'
+            # The name is derived from the content, an existing file already holds this thumbnail
+            if not default_storage.exists(path):
+                if resized is None:
+                    resized = image.copy()
+                    resized.thumbnail((width, image.height * width // image.width or 1), Image.LANCZOS)
+                    resized = resized.convert('RGB')
+                buffer = BytesIO()
+                resized.save(buffer, image_format, quality=THUMBNAIL_QUALITY)
+                default_storage.save(path, ContentFile(buffer.getvalue()))
+            thumbnails[name][str(width)] = path
+    return thumbnails
+
+
+def thumbnail_paths(thumbnails):
+    """The file names of thumbnails as returned by ``generate_thumbnails``."""
+    return {path for paths in thumbnails.values() for path in paths.values()}
+
+
+def delete_thumbnails(paths):
+    """Remove thumbnail files from the default storage."""
+    for path in paths:
+        default_storage.delete(path)
@@ -1,5 +1,5 @@
 from django.urls import path
-from api import views
+from api import async_views, views
 
 
 urlpatterns = [
@@ -7,6 +7,13 @@ urlpatterns = [
     path('qualified-barbers', views.get_qualified_barbers, name='qualified-barbers'),
     path('blocked-dates', views.get_blocked_dates, name='available-dates'),
     path("available-time-slots", views.get_available_timeslots, name="available-time-slots"),
+    path("bookings", views.create_booking_view, name="create-booking"),
+    path("any-barber-time-slots", views.get_any_barber_timeslots, name="any-barber-time-slots"),
+    path("availability-calendar", views.get_availability_calendar_view, name="availability-calendar"),
+    path("async/services", async_views.get_services, name='async-services'),
+    path('async/qualified-barbers', async_views.get_qualified_barbers, name='async-qualified-barbers'),
+    path('async/blocked-dates', async_views.get_blocked_dates, name='async-available-dates'),
+    path("async/available-time-slots", async_views.get_available_timeslots, name="async-available-time-slots"),
     # path("login", views.login, name="login"),
     # path("register", views.register, name="register"),
 ]
\ No newline at end of file
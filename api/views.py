@@ -1,18 +1,62 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from api.models.models import Service, Barber, BarberSchedule, Booking, TimeOffRequest, SelectedService
-from .serializers import ServiceSerializer, BarberSerializer
+from django.contrib.auth.models import User
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from api import catalogue
+from api.models.models import Service, Barber, Booking, TimeOffRequest, SelectedService, \
+    BarberQualification, BookingLock, DailyBarberEarnings
+from .serializers import ServiceSerializer, BarberSerializer, BookingCreateSerializer, BookingSerializer
+from .availability import cutoff, date_range, from_minutes, get_day_slots, load_days, to_minutes
+from .schedules import RECURRING_TIME_OFF_HORIZON, last_time_off_date
+from django.db import transaction, OperationalError
+from collections import defaultdict
+from time import sleep
 from datetime import datetime, timedelta
-from django.db.models import Q
+from django.utils import timezone
+from django.db.models import Q, Max, Sum, Count
 from datetime import time
 
+SERVICES_TABLES = [Service]
+QUALIFIED_BARBERS_TABLES = [Barber, BarberQualification, User]
+
+
+def get_services_etag(request):
+    return catalogue.get_etag(SERVICES_TABLES)
+
+
+def get_services_last_modified(request):
+    return catalogue.get_last_modified(SERVICES_TABLES)
+
+
+@cache_control(public=True, max_age=catalogue.CATALOGUE_MAX_AGE)
+@condition(etag_func=get_services_etag, last_modified_func=get_services_last_modified)
 @api_view(['GET'])
 def get_services(request):
     """Returns list of available services."""
-    services = Service.objects.all()
-    serializer = ServiceSerializer(services, many=True)
-    return Response(serializer.data)
+    def build():
+        return ServiceSerializer(Service.objects.all(), many=True).data
+
+    return Response(catalogue.get_payload(SERVICES_TABLES, [], build))
+
 
+def get_qualified_barbers_etag(request):
+    service_id = request.GET.get('service_id')
+    if not service_id:
+        return None
+    # Profile image URLs are absolute, so the payload depends on the host too
+    return catalogue.get_etag(QUALIFIED_BARBERS_TABLES, service_id, request.build_absolute_uri('/'))
+
+
+def get_qualified_barbers_last_modified(request):
+    if not request.GET.get('service_id'):
+        return None
+    return catalogue.get_last_modified(QUALIFIED_BARBERS_TABLES)
+
+
+@cache_control(public=True, max_age=catalogue.CATALOGUE_MAX_AGE)
+@condition(etag_func=get_qualified_barbers_etag, last_modified_func=get_qualified_barbers_last_modified)
 @api_view(['GET'])
 def get_qualified_barbers(request):
     """Returns list of qualified barbers for the provided service id."""
@@ -20,20 +64,58 @@ def get_qualified_barbers(request):
     if not service_id:
         return Response({"error": "Service ID is required."}, status=400)
 
-    qualified_barbers = Barber.objects.filter(barberqualification__service_id=service_id)
-    serializer = BarberSerializer(qualified_barbers, many=True, context={'request': request})
-    return Response(serializer.data)
+    def build():
+        qualified_barbers = Barber.objects.filter(
+            barberqualification__service_id=service_id
+        ).select_related('user').distinct()
+        return BarberSerializer(qualified_barbers, many=True, context={'request': request}).data
+
+    parts = [service_id, request.build_absolute_uri('/')]
+    return Response(catalogue.get_payload(QUALIFIED_BARBERS_TABLES, parts, build))
 
 
-def get_time_slots(barber_id, date, service_id):
+def get_service_ids(request):
     """
-    Generate a list of time slots for a barber on a given date, considering service duration,
-    existing appointments, time-off requests, and excluding past slots for the current day.
+    Read service IDs from the query string. Accepts repeated ``service_id`` parameters,
+    comma separated values, or both.
+
+    Raises:
+        ValueError: If an ID is not an integer.
+    """
+    values = request.GET.getlist('service_id')
+    return [int(value) for param in values for value in param.split(',') if value.strip()]
+
+
+def get_services_duration(service_ids):
+    """
+    Returns the combined duration in minutes of one or several services, using one query.
+
+    Args:
+        service_ids (int | list): ID or IDs of the selected services.
+
+    Raises:
+        Service.DoesNotExist: If any of the services does not exist.
+    """
+    if isinstance(service_ids, (int, str)):
+        service_ids = [service_ids]
+    service_ids = {int(service_id) for service_id in service_ids}
+
+    services = Service.objects.filter(id__in=service_ids).aggregate(total=Sum('duration'), count=Count('id'))
+    if not service_ids or services['count'] != len(service_ids):
+        raise Service.DoesNotExist('Service not found.')
+    return services['total']
+
+
+def get_time_slots(barber_id, date, service_ids):
+    """
+    Generate a list of time slots for a barber on a given date, considering the combined
+    duration of the selected services, existing appointments, time-off requests, and
+    excluding past slots for the current day.
 
     Args:
         barber_id (int): ID of the barber.
         date (datetime.date): Date for which to generate the slots.
-        service_id (int): ID of the service to calculate the duration.
+        service_ids (int | list): ID or IDs of the services to calculate the duration.
 
     Returns:
         list: List of time objects representing 15-minute intervals.
@@ -44,129 +126,246 @@ def get_time_slots(barber_id, date, service_id):
         if date < now.date():
             return []
 
-        # Get the barber's schedule for the specified day of the week
-        day_of_week = date.strftime('%A')
-        schedule = BarberSchedule.objects.get(barber_id=barber_id, day_of_week=day_of_week)
+        # Get the combined duration of the services
+        duration = get_services_duration(service_ids)
 
-        # Get the duration of the service
-        service = Service.objects.get(id=service_id)
-        service_duration = timedelta(minutes=service.duration)
+        # Slots of the barber for the given date, considering schedule, appointments and time-off requests
+        working, slots = get_day_slots([barber_id], date, date, duration)[(int(barber_id), date)]
+        if not working:
+            print('Schedule not found for the barber on this day.')
+            return []
 
-        start_time = schedule.start_time
-        end_time = schedule.end_time
+        # Ensure we exclude past time slots for today
+        not_before = cutoff(date, now)
+        return [from_minutes(slot) for slot in slots if not_before is None or slot > not_before]
 
-        # Adjust end time for the service duration
-        adjusted_end_time = (datetime.combine(date, end_time) - service_duration).time()
+    except Service.DoesNotExist:
+        print('Service not found.')
+        return []
 
-        # Fetch existing appointments and time-off requests for the barber on the given date
-        appointments = Booking.objects.filter(barber_id=barber_id, booking_date=date)
-        time_offs = TimeOffRequest.objects.filter(barber_id=barber_id, date=date, isApproved=True)
+    except Exception as e:
+        print(f"Error generating time slots: {e}")
+        return []
 
-        # Calculate blocked times based on existing appointments
-        blocked_intervals = []
-        for appointment in appointments:
-            selected_services = SelectedService.objects.filter(appointment=appointment)
-            total_duration = sum([s.service.duration for s in selected_services], 0)
-            total_duration_delta = timedelta(minutes=total_duration)
 
-            appointment_start = datetime.combine(date, appointment.start_time)
-            appointment_end = appointment_start + total_duration_delta
-            adjusted_start_time = appointment_start - service_duration
+def get_any_barber_time_slots(service_ids, date):
+    """
+    Compute the time slots on a given date for every barber qualified for all of the
+    selected services in one batched pass.
 
-            blocked_intervals.append((adjusted_start_time.time(), appointment_end.time()))
+    Args:
+        service_ids (int | list): ID or IDs of the services to calculate the duration.
+        date (datetime.date): Date for which to generate the slots.
 
-        # Calculate blocked times based on time-off requests
-        for time_off in time_offs:
-            to_start_time = time_off.start_time
-            to_end_time = time_off.end_time
-            to_start_dt = datetime.combine(date, to_start_time) - service_duration
-            to_end_dt = datetime.combine(date, to_end_time)
-            blocked_intervals.append((to_start_dt.time(), to_end_dt.time()))
+    Returns:
+        list: Dicts with the slot time and the IDs of the barbers free at that time, sorted by time.
+    """
+    now = datetime.now()
+    if date < now.date():
+        return []
 
-        # Generate time slots at 15-minute intervals, excluding blocked intervals
-        slots = []
-        current_time = datetime.combine(date, start_time)
-        end_datetime = datetime.combine(date, adjusted_end_time)
+    if isinstance(service_ids, (int, str)):
+        service_ids = [service_ids]
+    service_ids = {int(service_id) for service_id in service_ids}
+    duration = get_services_duration(service_ids)
+
+    barber_ids = list(
+        BarberQualification.objects.filter(service_id__in=service_ids)
+        .values('user_id').annotate(qualifications=Count('service_id'))
+        .filter(qualifications=len(service_ids)).values_list('user_id', flat=True)
+    )
+    if not barber_ids:
+        return []
 
-        # Ensure we exclude past time slots for today
-        while current_time <= end_datetime:
-            slot_time = current_time.time()
-            if date == now.date() and current_time.time() <= now.time():
-                current_time += timedelta(minutes=15)
-                continue
+    not_before = cutoff(date, now)
+    barbers_by_slot = defaultdict(list)
+    for (barber_id, _), (working, slots) in get_day_slots(barber_ids, date, date, duration).items():
+        for slot in slots:
+            if not_before is None or slot > not_before:
+                barbers_by_slot[slot].append(barber_id)
 
-            # Check if the slot is not in any blocked interval
-            if not any(start <= slot_time < end for start, end in blocked_intervals):
-                slots.append(slot_time)
-            current_time += timedelta(minutes=15)
+    return [
+        {'time': from_minutes(slot), 'barbers': sorted(barbers_by_slot[slot])}
+        for slot in sorted(barbers_by_slot)
+    ]
 
-        return slots
 
-    except BarberSchedule.DoesNotExist:
-        print('Schedule not found for the barber on this day.')
-        return []
+MAX_CALENDAR_DAYS = 92
+
+
+def get_availability_calendar(barber_id, service_ids, start_date, end_date):
+    """
+    Compute per-day availability for a barber and services over a date range in a fixed
+    number of queries, independent of the number of days and bookings.
+
+    Args:
+        barber_id (int): ID of the barber.
+        service_ids (int | list): ID or IDs of the services to calculate the duration.
+        start_date (datetime.date): First date of the range.
+        end_date (datetime.date): Last date of the range, inclusive.
+
+    Returns:
+        list: One dict per date with the number of free slots, whether the barber works
+        that day and whether the day is fully blocked.
+    """
+    duration = get_services_duration(service_ids)
+    days = get_day_slots([barber_id], start_date, end_date, duration)
+    return build_availability_calendar(barber_id, days, start_date, end_date)
+
+
+def build_availability_calendar(barber_id, days, start_date, end_date):
+    """
+    Per-day availability of a barber from the result of ``get_day_slots``, see
+    ``get_availability_calendar``.
+    """
+    now = datetime.now()
+    calendar = []
+    for date in date_range(start_date, end_date):
+        working, slots = days[(int(barber_id), date)]
+        not_before = cutoff(date, now)
+        if not_before is not None:
+            slots = [slot for slot in slots if slot > not_before]
+        calendar.append({
+            'date': date,
+            'slots': len(slots),
+            'working': working,
+            'blocked': not slots,
+        })
+    return calendar
 
+
+@api_view(['GET'])
+def get_availability_calendar_view(request):
+    """
+    Returns per-day slot counts and fully-blocked flags for a barber and one or more
+    services between start_date and end_date (defaults to the next 30 days).
+    """
+    barber_id = request.query_params.get('barber_id')
+    try:
+        service_ids = get_service_ids(request)
+    except ValueError:
+        return Response({"error": "service_id must be a list of integers."}, status=400)
+    try:
+        barber_id = int(barber_id) if barber_id else None
+    except ValueError:
+        return Response({"error": "barber_id must be an integer."}, status=400)
+
+    if not barber_id or not service_ids:
+        return Response({"error": "barber_id and service_id are required parameters"}, status=400)
+
+    try:
+        today = datetime.now().date()
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else today
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else start_date + timedelta(days=30)
+    except ValueError:
+        return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=400)
+
+    if end_date < start_date or (end_date - start_date).days >= MAX_CALENDAR_DAYS:
+        return Response({"error": f"The date range must be between 1 and {MAX_CALENDAR_DAYS} days."}, status=400)
+
+    try:
+        calendar = get_availability_calendar(barber_id, service_ids, start_date, end_date)
     except Service.DoesNotExist:
-        print('Service not found.')
-        return []
+        return Response({"error": "Service not found."}, status=404)
 
-    except Exception as e:
-        print(f"Error generating time slots: {e}")
-        return []
+    for day in calendar:
+        day['date'] = day['date'].strftime('%Y-%m-%d')
+    return Response(calendar)
+
+
+@api_view(['GET'])
+def get_any_barber_timeslots(request):
+    """
+    Retrieve the union of available time slots of all barbers qualified for the selected
+    services on a specific date, with the barbers that can take each slot.
+    """
+    date = request.query_params.get('date')
+    try:
+        service_ids = get_service_ids(request)
+    except ValueError:
+        return Response({"error": "service_id must be a list of integers."}, status=400)
+
+    if not service_ids or not date:
+        return Response({"error": "service_id and date are required parameters"}, status=400)
+
+    try:
+        date = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        return Response({"error": "Date must be in YYYY-MM-DD format."}, status=400)
+
+    try:
+        slots = get_any_barber_time_slots(service_ids, date)
+    except Service.DoesNotExist:
+        return Response({"error": "Service not found."}, status=404)
+    return Response(slots)
 
 
 @api_view(['GET'])
 def get_blocked_dates(request):
     """
     Returns a list of dates that are fully booked or unavailable for a given barber.
+    When no service_id is provided, a date is blocked if even the shortest service does not fit.
     """
     barber_id = request.query_params.get('barber_id')
+    try:
+        service_ids = get_service_ids(request)
+    except ValueError:
+        return Response({"error": "service_id must be a list of integers."}, status=400)
 
     if not barber_id:
         return Response({"error": "Barber ID is required."}, status=400)
 
-    today = datetime.now().date()
+    if not service_ids:
+        service = Service.objects.order_by('duration').first()
+        if service is None:
+            return Response([])
+        service_ids = [service.id]
 
-    # Fetch bookings and time-off requests starting from today
-    bookings = Booking.objects.filter(barber_id=barber_id, booking_date__gte=today)
-    time_off_requests = TimeOffRequest.objects.filter(barber_id=barber_id, date__gte=today, isApproved=True)
-
-    # Identify dates with full bookings or time-off requests
-    busy_dates = set()
+    today = datetime.now().date()
 
-    for booking in bookings:
-        busy_dates.add(booking.booking_date)
+    # Only dates up to the last booking or time off can be fully booked
+    last_booking = Booking.objects.filter(barber_id=barber_id, booking_date__gte=today).aggregate(
+        last=Max('booking_date'))['last']
+    last_time_off = TimeOffRequest.objects.filter(barber_id=barber_id, date__gte=today, isApproved=True).aggregate(
+        last=Max('date'))['last']
+    last_recurring = last_time_off_date(barber_id, today, today + RECURRING_TIME_OFF_HORIZON)
+    busy_until = max(filter(None, [last_booking, last_time_off, last_recurring]), default=None)
+    if busy_until is None:
+        return Response([])
 
-    for time_off in time_off_requests:
-        busy_dates.add(time_off.date)
+    try:
+        calendar = get_availability_calendar(barber_id, service_ids, today, busy_until)
+    except Service.DoesNotExist:
+        return Response({"error": "Service not found."}, status=404)
 
-    blocked_dates = []
-    for busy_date in busy_dates:
-        print(busy_date)
-        time_slots = get_time_slots(barber_id, busy_date, barber_id)
-        print(time_slots)
-        if len(time_slots) == 0:
-            blocked_dates.append(busy_date)
+    blocked_dates = [day['date'] for day in calendar if day['working'] and day['blocked']]
 
     # Return sorted blocked dates
-    return Response(sorted([date.strftime('%Y-%m-%d') for date in blocked_dates]))
+    return Response([date.strftime('%Y-%m-%d') for date in blocked_dates])
 
 
 @api_view(['GET'])
 def get_available_timeslots(request):
     """
-    Retrieve available time slots for a specific barber on a specific date.
+    Retrieve available time slots for a specific barber on a specific date. Several
+    service_id values can be given to get slots for their combined duration.
     """
+    try:
+        service_ids = get_service_ids(request)
+    except ValueError:
+        return Response({"error": "service_id must be a list of integers."}, status=400)
+
     try:
         barber_id = request.query_params.get('barber_id')
         date = request.query_params.get('date')
-        service_id = request.query_params.get('service_id')
 
-        if not barber_id or not date or not service_id:
+        if not barber_id or not date or not service_ids:
             return Response({"error": "barber_id, date, service_id are required parameters"}, status=400)
 
         date = datetime.strptime(date, '%Y-%m-%d').date()
-        slots = get_time_slots(barber_id, date, service_id)
+        slots = get_time_slots(barber_id, date, service_ids)
         return Response(slots, status=200)
 
     except Exception as e:
@@ -174,6 +373,102 @@ def get_available_timeslots(request):
 
 
 
+class SlotUnavailableError(Exception):
+    """Raised when the requested booking slot is not available anymore."""
+
+
+class NotQualifiedError(Exception):
+    """Raised when the barber is not qualified for one of the selected services."""
+
+
+BOOKING_LOCK_RETRIES = 5
+
+
+def create_booking(user, barber_id, date, start_time, service_ids):
+    """
+    Create a booking and its selected services after re-validating the slot against the
+    availability engine while holding the barber's lock for that day.
+
+    Args:
+        user (User): Customer the booking is made for.
+        barber_id (int): ID of the barber.
+        date (datetime.date): Date of the booking.
+        start_time (datetime.time): Start time of the booking.
+        service_ids (list): IDs of the selected services.
+
+    Returns:
+        Booking: The created booking.
+
+    Raises:
+        Service.DoesNotExist: If any of the services does not exist.
+        NotQualifiedError: If the barber is not qualified for one of the services.
+        SlotUnavailableError: If the slot overlaps another booking or time-off, or is outside the schedule.
+    """
+    service_ids = sorted(set(service_ids))
+    duration = get_services_duration(service_ids)
+
+    qualifications = BarberQualification.objects.filter(user_id=barber_id, service_id__in=service_ids)
+    if qualifications.count() != len(service_ids):
+        raise NotQualifiedError('The barber is not qualified for all of the selected services.')
+
+    # Make sure the lock row exists, so that the first statement of the transaction below is a write
+    lock, _ = BookingLock.objects.get_or_create(barber_id=barber_id, date=date)
+
+    with transaction.atomic():
+        # Updating the lock row holds a row lock (PostgreSQL, MySQL) or the database write lock
+        # (SQLite) until commit, so concurrent creations for this barber and day run one at a time
+        BookingLock.objects.select_for_update().filter(pk=lock.pk).update(locked_at=timezone.now())
+
+        day = load_days([barber_id], date, date).get((int(barber_id), date))
+        if day is None or not day.is_slot(to_minutes(start_time), duration, not_before=cutoff(date, datetime.now())):
+            raise SlotUnavailableError('The selected time slot is not available.')
+
+        # bulk_create skips the signals that sync the duration and earnings, so they are set here
+        booking = Booking.objects.create(
+            barber_id=barber_id, user=user, booking_date=date, start_time=start_time, duration_minutes=duration
+        )
+        SelectedService.objects.bulk_create(
+            [SelectedService(appointment=booking, service_id=service_id) for service_id in service_ids]
+        )
+        DailyBarberEarnings.refresh(barber_id, date)
+    return booking
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_booking_view(request):
+    """
+    Book a time slot with a barber for the authenticated user. Returns 409 if the slot was taken.
+    """
+    serializer = BookingCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+    data = serializer.validated_data
+    service_ids = data['service_ids']
+
+    for attempt in range(BOOKING_LOCK_RETRIES):
+        try:
+            booking = create_booking(
+                request.user, data['barber_id'], data['date'], data['start_time'], service_ids
+            )
+            break
+        except NotQualifiedError as e:
+            return Response({"error": str(e)}, status=400)
+        except SlotUnavailableError as e:
+            return Response({"error": str(e)}, status=409)
+        except Service.DoesNotExist:
+            return Response({"error": "Service not found."}, status=404)
+        except OperationalError:
+            # SQLite reports contention instead of waiting in some configurations, try again
+            if attempt == BOOKING_LOCK_RETRIES - 1:
+                return Response({"error": "The booking could not be created, please try again."}, status=503)
+            sleep(0.05 * (attempt + 1))
+
+    data = BookingSerializer(booking).data
+    data['services'] = sorted(set(service_ids))
+    return Response(data, status=201)
+
+
 # def get_available_timeslots(request):
 #     """Returns list of available timeslots for the provided service id and barber id for the chosen date."""
 #     service_id = request.query_params.get('service_id')
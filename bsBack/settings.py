@@ -87,6 +87,36 @@ DATABASES = {
 }
 
 
+# Cache
+# An in-process LRU in front of a cache shared by all worker processes of the host,
+# see api/cache_backends.py
+
+CACHES = {
+    "default": {
+        "BACKEND": "api.cache_backends.TieredCache",
+        "LOCATION": "default",
+        "OPTIONS": {
+            "SHARED_ALIAS": "shared",
+            "MAX_ENTRIES": 5000,
+            "LOCAL_TIMEOUT": 60,
+            # Version tokens are bumped by other processes too, hit counters are only kept shared
+            "LOCAL_TIMEOUTS": {"version:": 2, "stats:": 0},
+        },
+    },
+    "shared": {
+        "BACKEND": "api.cache_backends.SQLiteCache",
+        "LOCATION": BASE_DIR / ".cache" / "cache.sqlite3",
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {
+            "MAX_ENTRIES": 200000,
+        },
+    },
+}
+
+# Tests run against throwaway caches instead of the shared file above
+TEST_RUNNER = "api.test_runner.TestRunner"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -123,7 +153,13 @@ USE_TZ = True
 STATIC_URL = "/static/"
 MEDIA_URL = '/images/'
 STATICFILES_DIRS = [
-    BASE_DIR / 'static'
+    BASE_DIR / 'static',
+]
+STATICFILES_FINDERS = [
+    "django.contrib.staticfiles.finders.FileSystemFinder",
+    "django.contrib.staticfiles.finders.AppDirectoriesFinder",
+    # plotly.js is served from the plotly package as static/plotly/plotly.min.js rather than inlined into pages
+    "api.finders.PlotlyFinder",
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 MEDIA_ROOT = "static/images"